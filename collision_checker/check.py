@@ -1,4 +1,5 @@
-import itertools
+import numpy as np
+from .connectivity import SafeLattice
 
 def get_collision_info(condition, nodes, edges, node_info, edge_info=None):
     """check collisions
@@ -11,38 +12,90 @@ def get_collision_info(condition, nodes, edges, node_info, edge_info=None):
     Returns:
         collision_info (dict): dictionary of the collision information
     """
+    collision_info = {col: [] for col in condition}
+    for col, i in iter_collision_info(condition, nodes, edges, node_info, edge_info):
+        collision_info[col].append(i)
+    return collision_info
+
+def evaluate(condition, context):
+    """check collisions without changing the conditions
+    The conditions and the context are only read, so that they can be shared by the threads
+    evaluating many snapshots at once. The margins are evaluated by the NumPy kernels over
+    all the applicable targets of each condition.
+    Args:
+        condition (list): list of the collision conditions
+        context (Context): lattice and calibration
+    Returns:
+        collision_info (dict): dictionary of the collision information, same as get_collision_info
+    """
     collision_info = {}
     for col in condition:
-        collision_info[col] = []
+        index = col.get_index(context=context)
+        margins = col.margins(index, context)
+        collision_info[col] = [index.targets[k] for k in np.nonzero(margins < 0)[0]]
+    return collision_info
+
+def iter_collision_info(condition, nodes, edges, node_info, edge_info=None, anchors=None):
+    """check collisions and yield them one by one as they are found
+    Args:
+        condition (list): list of the collision conditions
+        nodes (list): list of the node labels
+        edges (list): list of the edge labels
+        node_info (dict): dictionary of the node information
+        edge_info (dict): dictionary of the edge information
+        anchors (list): labels of the first target qubit to be checked (all nodes if None)
+    Yields:
+        col (FrequencyCollision): collision condition
+        targets (tuple): labels of the target qubits in collision
+    """
+    if anchors is None:
+        anchors = nodes
+    for col in condition:
         col.set_info(node_info, edge_info)
         col.set_graph(nodes, edges)
-        for i in itertools.permutations(nodes, r=col.body):
-            if col.check(*i):
-                collision_info[col].append(i)
-    return collision_info
+        for i in anchors:
+            for targets in col.candidates(i):
+                if col.check(*targets):
+                    yield col, targets
 
-def get_safe_lattice(nodes, edges, collision_info):
+def get_safe_lattice(nodes, edges, collision_info, context=None):
     """find safe lattice
     Args:
         nodes (list): list of the node labels
         edges (list): list of the edge labels
         collision_info (dict): dictionary of the collision information
+        context (Context): lattice and calibration used for the removals
     Returns:
         safe_nodes (list): list of the safe node labels
         safe_edges (list): list of the safe edge labels
     """
-    all_edges = []
-    for i in edges:
-        all_edges.append(i)
-        all_edges.append((i[1], i[0]))
-
     cnodes = set()
     cedges = set()
     for collision, i in collision_info.items():
         for j in i:
-            rnodes, redges = collision.remove(*j)
+            rnodes, redges = collision.remove(*j, context=context)
             cnodes |= set(rnodes)
             cedges |= set(redges)
+    return get_safe_lattice_from_removal(nodes, edges, cnodes, cedges)
+
+def get_safe_lattice_from_removal(nodes, edges, removal_nodes, removal_edges):
+    """find safe lattice from the nodes and edges removed by the collisions
+    Args:
+        nodes (list): list of the node labels
+        edges (list): list of the edge labels
+        removal_nodes (set): set of the removed node labels
+        removal_edges (set): set of the removed edge labels
+    Returns:
+        safe_nodes (list): list of the safe node labels
+        safe_edges (list): list of the safe edge labels
+    """
+    all_edges = []
+    for i in edges:
+        all_edges.append(i)
+        all_edges.append((i[1], i[0]))
+
+    cnodes = set(removal_nodes)
+    cedges = set(removal_edges)
 
     sedges = []
     for i in all_edges:
@@ -52,4 +105,69 @@ def get_safe_lattice(nodes, edges, collision_info):
     snodes = list(set(nodes) - cnodes)
     sedges = list(set(sedges) - cedges)
 
-    return snodes, sedges
\ No newline at end of file
+    return snodes, sedges
+
+def get_node_status(condition, q, context=None):
+    """check the collisions involving the node, without checking the whole lattice
+    The conditions must be set by set_info and set_graph (e.g. by get_collision_info) beforehand
+    unless the context is given.
+    Args:
+        condition (list): list of the collision conditions
+        q (int): node label
+        context (Context): lattice and calibration
+    Returns:
+        collision (dict): dictionary of the list of (targets, margin) in collision for each condition
+        margin (dict): dictionary of the smallest margin in MHz among the targets for each condition
+    """
+    collision = {}
+    margin = {}
+    for col in condition:
+        collision[col], margin[col] = _get_status(col, col.get_index(q, context), context)
+    return collision, margin
+
+def get_edge_status(condition, i, j, context=None):
+    """check the collisions making CR(i>j) unusable, without checking the whole lattice
+    The conditions must be set by set_info and set_graph (e.g. by get_collision_info) beforehand
+    unless the context is given.
+    Args:
+        condition (list): list of the collision conditions
+        i (int): control qubit
+        j (int): target qubit
+        context (Context): lattice and calibration
+    Returns:
+        collision (dict): dictionary of the list of (targets, margin) removing the edge or its nodes for each condition
+        margin (dict): dictionary of the smallest margin in MHz among the targets removing the edge or its nodes for each condition
+    """
+    collision = {}
+    margin = {}
+    for col in condition:
+        collision[col], margin[col] = _get_status(col, col.get_edge_index(i, j, context), context)
+    return collision, margin
+
+def _get_status(col, targets, context=None):
+    """evaluate the margins of the applicable targets
+    Args:
+        col (FrequencyCollision): collision condition
+        targets (TargetIndex): index of the list of the targets
+        context (Context): lattice and calibration
+    Returns:
+        collision (list): list of (targets, margin) in collision
+        margin (float): smallest margin among the targets (np.inf if there is no target)
+    """
+    margins = col.margins(targets, context)
+    collision = [(targets.targets[k], float(margins[k])) for k in np.nonzero(margins < 0)[0]]
+    return collision, float(np.nanmin(margins, initial=np.inf))
+
+def get_safe_lattice_info(nodes, edges, collision_info, context=None):
+    """find safe lattice together with its connected components
+    Args:
+        nodes (list): list of the node labels
+        edges (list): list of the edge labels
+        collision_info (dict): dictionary of the collision information
+        context (Context): lattice and calibration used for the removals
+    Returns:
+        safe_lattice (SafeLattice): safe lattice which can be updated by adding or resolving collisions
+    """
+    safe_lattice = SafeLattice(nodes, edges, context)
+    safe_lattice.add_collision_info(collision_info)
+    return safe_lattice
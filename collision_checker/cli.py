@@ -0,0 +1,243 @@
+import sys
+import json
+import pickle
+import argparse
+import multiprocessing
+from .collision import (
+    Type0A, Type0B, Type1A, Type1B, Type1C, Type2A,
+    Type2B, Type3A, Type3B, Type7, Type8, Type9
+)
+from .check import iter_collision_info, get_safe_lattice_from_removal
+from .context import Lattice, Context
+from .lattice import qubit_lattice
+
+CONDITIONS = {
+    cls.__name__: cls for cls in [
+        Type0A, Type0B, Type1A, Type1B, Type1C, Type2A,
+        Type2B, Type3A, Type3B, Type7, Type8, Type9
+    ]
+}
+
+def parse_label(label):
+    """convert the node label written in a file into int if possible
+    Args:
+        label (str): node label
+    Returns:
+        label (int or str): node label
+    """
+    try:
+        return int(label)
+    except ValueError:
+        return label
+
+def parse_edge_label(label):
+    """convert the edge label such as "0,1" or "(0, 1)" into a tuple
+    Args:
+        label (str): edge label
+    Returns:
+        label (tuple): edge label
+    """
+    return tuple(parse_label(i.strip()) for i in label.strip("()[] ").split(","))
+
+def load_edge_list(path):
+    """load the lattice structure from the edge list file
+    Each line contains the labels of the two coupled qubits separated by whitespace,
+    or a single label for an isolated qubit. Lines starting with "#" are ignored.
+    Args:
+        path (str): path to the edge list file
+    Returns:
+        nodes (list): list of the node labels
+        edges (list): list of the edge labels
+    """
+    nodes = []
+    edges = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#")[0].split()
+            if not line:
+                continue
+            labels = [parse_label(i) for i in line]
+            for i in labels:
+                if i not in nodes:
+                    nodes.append(i)
+            if len(labels) == 2:
+                edges.append(tuple(labels))
+            elif len(labels) != 1:
+                raise ValueError(f"invalid line in the edge list: {' '.join(line)}")
+    return nodes, edges
+
+def load_calibration(path):
+    """load node_info and edge_info from the json or pickle file
+    The file contains either the node_info dictionary itself, or a dictionary
+    with "node_info" and "edge_info" keys.
+    Args:
+        path (str): path to the calibration file
+    Returns:
+        node_info (dict): dictionary of the node information
+        edge_info (dict): dictionary of the edge information
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        text_keys = True
+    else:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        text_keys = False
+
+    if "node_info" in data:
+        node_info = data["node_info"]
+        edge_info = data.get("edge_info", {})
+    else:
+        node_info = data
+        edge_info = {}
+
+    if text_keys:
+        node_info = {parse_label(key): val for key, val in node_info.items()}
+        edge_info = {parse_edge_label(key): val for key, val in edge_info.items()}
+    return node_info, edge_info
+
+def parse_default(items):
+    """convert KEY=VALUE items into the dictionary of the default values
+    Args:
+        items (list): list of KEY=VALUE strings
+    Returns:
+        default (dict): dictionary of the default values
+    """
+    default = {}
+    for item in items:
+        key, val = item.split("=", 1)
+        default[key] = float(val)
+    return default
+
+def make_condition(types, default=None, safe_mode=False):
+    """generate the collision conditions from their class names
+    Args:
+        types (list): list of the class names of the collisions
+        default (dict): dictionary of the default values
+        safe_mode (bool): whether you remove the both of the nodes in Type3 or not
+    Returns:
+        condition (list): list of the collision conditions
+    """
+    condition = []
+    for name in types:
+        if name == "Type3A":
+            condition.append(CONDITIONS[name](default, safe_mode=safe_mode))
+        else:
+            condition.append(CONDITIONS[name](default))
+    return condition
+
+_worker = {}
+
+def _init_worker(types, default, safe_mode, nodes, edges, node_info, edge_info):
+    """set up the collision conditions and the context shared by the tasks in the worker process"""
+    _worker["condition"] = make_condition(types, default, safe_mode)
+    _worker["context"] = Context(Lattice(nodes, edges), node_info, edge_info, freeze=False)
+
+def _check_anchors(task):
+    """check the collisions of one condition for the chunk of the first targets"""
+    idx, anchors = task
+    col = _worker["condition"][idx]
+    context = _worker["context"]
+    return idx, [t for i in anchors for t in col.candidates(i, context) if col.check(*t, context=context)]
+
+def iter_collision_parallel(condition, nodes, edges, node_info, edge_info, types, default, safe_mode, processes, chunk):
+    """check collisions with the worker processes and yield them in the same order as the serial run
+    Args:
+        condition (list): list of the collision conditions in the main process
+        nodes (list): list of the node labels
+        edges (list): list of the edge labels
+        node_info (dict): dictionary of the node information
+        edge_info (dict): dictionary of the edge information
+        types (list): list of the class names of the collisions
+        default (dict): dictionary of the default values
+        safe_mode (bool): whether you remove the both of the nodes in Type3 or not
+        processes (int): number of the worker processes
+        chunk (int): number of the first targets checked in a task
+    Yields:
+        col (FrequencyCollision): collision condition
+        targets (tuple): labels of the target qubits in collision
+    """
+    nodes = list(nodes)
+    tasks = []
+    for idx in range(len(condition)):
+        for s in range(0, len(nodes), chunk):
+            tasks.append((idx, nodes[s:s+chunk]))
+
+    initargs = (types, default, safe_mode, nodes, edges, node_info, edge_info)
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+        for idx, found in pool.imap(_check_anchors, tasks):
+            for i in found:
+                yield condition[idx], i
+
+def main(argv=None):
+    """command line entry point
+    The collisions are written to stdout as JSON Lines while they are found,
+    followed by the safe lattice.
+    Args:
+        argv (list): list of the command line arguments (sys.argv[1:] if None)
+    """
+    parser = argparse.ArgumentParser(
+        prog="collision_checker",
+        description="check the frequency collisions and stream them as JSON Lines",
+    )
+    lattice = parser.add_mutually_exclusive_group(required=True)
+    lattice.add_argument("--lattice", nargs=2, type=int, metavar=("N", "D"),
+                         help="RQC square lattice of N qubits with D mux in a line")
+    lattice.add_argument("--edges", metavar="FILE",
+                         help="edge list file (two node labels per line)")
+    parser.add_argument("calibration",
+                        help="json or pickle file of node_info (or of node_info and edge_info)")
+    parser.add_argument("-t", "--types", nargs="+", default=list(CONDITIONS), choices=list(CONDITIONS),
+                        metavar="TYPE", help="collision types to check (default: all)")
+    parser.add_argument("--default", nargs="+", default=[], metavar="KEY=VALUE",
+                        help="override the default values such as cnot_time=200")
+    parser.add_argument("--safe-mode", action="store_true",
+                        help="remove the both of the nodes in Type3A")
+    parser.add_argument("-j", "--processes", type=int, default=1,
+                        help="number of the worker processes (default: 1)")
+    parser.add_argument("--chunk", type=int, default=16,
+                        help="number of the first targets checked in a task (default: 16)")
+    parser.add_argument("--count", action="store_true",
+                        help="write only the number of the collisions of each type")
+    args = parser.parse_args(argv)
+
+    if args.lattice is not None:
+        nodes, edges, _ = qubit_lattice(*args.lattice)
+    else:
+        nodes, edges = load_edge_list(args.edges)
+    node_info, edge_info = load_calibration(args.calibration)
+    default = parse_default(args.default)
+    condition = make_condition(args.types, default, args.safe_mode)
+
+    if args.processes > 1:
+        for col in condition:
+            col.set_info(node_info, edge_info)
+            col.set_graph(nodes, edges)
+        collisions = iter_collision_parallel(
+            condition, nodes, edges, node_info, edge_info,
+            args.types, default, args.safe_mode, args.processes, args.chunk
+        )
+    else:
+        collisions = iter_collision_info(condition, nodes, edges, node_info, edge_info)
+
+    out = sys.stdout
+    count = {col: 0 for col in condition}
+    cnodes = set()
+    cedges = set()
+    for col, i in collisions:
+        count[col] += 1
+        rnodes, redges = col.remove(*i)
+        cnodes |= set(rnodes)
+        cedges |= set(redges)
+        if not args.count:
+            out.write(json.dumps({"collision": col.name, "targets": list(i)}) + "\n")
+            out.flush()
+
+    if args.count:
+        for col, c in count.items():
+            out.write(json.dumps({"collision": col.name, "count": c}) + "\n")
+
+    snodes, sedges = get_safe_lattice_from_removal(nodes, edges, cnodes, cedges)
+    out.write(json.dumps({"safe_nodes": sorted(snodes), "safe_edges": [list(i) for i in sorted(sedges)]}) + "\n")
+    out.flush()
@@ -1,9 +1,36 @@
 import numpy as np
-import networkx as nx
+from .context import Lattice, Context, TargetIndex
+
+# argument name of the collision kernels: (position of the target(s), key of the value)
+# the key of the couplings is None since it depends on the distance between the targets
+VALUE_KEYS = {
+    "wi" : (0, "frequency"),
+    "wj" : (1, "frequency"),
+    "wk" : (2, "frequency"),
+    "ai" : (0, "anharmonicity"),
+    "aj" : (1, "anharmonicity"),
+    "ak" : (2, "anharmonicity"),
+    "t1" : (0, "t1"),
+    "t2" : (0, "t2_echo"),
+    "wmin" : (0, "min_frequency"),
+    "wmax" : (0, "max_frequency"),
+    "t1min" : (0, "min_t1"),
+    "t2min" : (0, "min_t2"),
+    "dmax" : ((0, 1), "max_detuning"),
+    "gij" : ((0, 1), None),
+    "gik" : ((0, 2), None),
+}
 
 class FrequencyCollision:
     """Class of Frequency Collision"""
 
+    # whether the collision comes only from the static coupling gij between the targets,
+    # so that it also applies to the pairs coupled by the parasitic coupling
+    static_coupling = False
+    # whether the margin is piecewise linear in each frequency, with its zeros on the pieces
+    # next to the zeros of the resonance forms, so that the collision windows are solved exactly
+    piecewise_linear = False
+
     def __init__(self, default=None):
         """Initailize the Class
         Args:
@@ -13,6 +40,8 @@ class FrequencyCollision:
         self.name = None
         self.note = None
         self.body = None
+        self.distances = None
+        self.context = None
 
         design_nn_detuining = 700 # MHz
 
@@ -40,7 +69,10 @@ class FrequencyCollision:
             nn_detuning = 800 # MHz
             self.default['nnn_coupling'] = self.default['coupling']**2/nn_detuning # qubit mediated interaction
 
-        # set alias
+        self.set_alias()
+
+    def set_alias(self):
+        """set the aliases of the default values used in the kernels (call again after changing self.default)"""
         self.b1 = self.default["bound_dist_1"]
         self.bc = self.default["bound_control_excite"]
         self.ozx = 1000/(4*self.default["cnot_time"]) # MHZ (zx interaction while CR)
@@ -51,11 +83,15 @@ class FrequencyCollision:
             nodes (list): list of the node labels = [0,1,2...]
             edges (list): list of the edge labels = [(0,1), (1,2), ...]
         """
+        # networkx is imported here so that the prepared snapshots can be loaded without it
+        import networkx as nx
         self.nodes = nodes
         self.edges = edges
         self.graph = nx.Graph()
         self.graph.add_nodes_from(self.nodes)
         self.graph.add_edges_from(self.edges)
+        self.lattice = Lattice(nodes, edges)
+        self.set_context()
 
     def set_info(self, node_info, edge_info={}):
         """reflect the information about nodes and edges
@@ -65,23 +101,260 @@ class FrequencyCollision:
         """
         self.node_info = node_info
         self.edge_info = edge_info
+        self.set_context()
+
+    def set_context(self):
+        """make the context referring to the information set by set_graph and set_info
+        The methods below use this context when the context is not given. Pass the context
+        explicitly instead of calling set_graph and set_info to share the condition among threads.
+        """
+        if hasattr(self, "lattice") and hasattr(self, "node_info"):
+            self.context = Context(self.lattice, self.node_info, self.edge_info, freeze=False)
+
+    def distance(self, i, j, context=None):
+        """get the distance between the nodes on the graph (np.inf if it is beyond 2)
+        Args:
+            i (int): node label
+            j (int): node label
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        """
+        context = self.context if context is None else context
+        return context.lattice.distance(i, j)
+
+    def applicable(self, *targets, context=None):
+        """whether the distances from the first target to the others match the condition
+        Args:
+            targets (tuple): labels of the target qubits
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        """
+        context = self.context if context is None else context
+        return tuple(context.lattice.distance(targets[0], t) for t in targets[1:]) in self.distances
 
-    def get_value(self, target, key):
-        """get the desired value from self.node_info or self.edge_info or self.default
+    def candidates(self, i, context=None):
+        """list up the targets starting from the node to which the condition is applicable
+        Args:
+            i (int): label of the first target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        Returns:
+            candidates (list): list of the targets in the same order as itertools.permutations
+        """
+        context = self.context if context is None else context
+        return context.lattice.candidates(self.distances, i)
+
+    def candidates_with(self, q, context=None):
+        """list up the targets containing the node to which the condition is applicable
+        Args:
+            q (int): node label
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        Returns:
+            candidates (list): list of the targets, where q can be at any position
+        """
+        context = self.context if context is None else context
+        return context.lattice.candidates_with(self.distances, q)
+
+    def get_index(self, q=None, context=None):
+        """get the index of the applicable targets, cached in the lattice
+        Args:
+            q (int): node label contained in the targets (all the targets in the lattice if None)
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        Returns:
+            index (TargetIndex): index of the list of the targets
+        """
+        context = self.context if context is None else context
+        return context.lattice.get_index(self.distances, q)
+
+    def get_edge_index(self, i, j, context=None):
+        """get the index of the applicable targets whose removal makes CR(i>j) unusable, cached in the lattice
+        Such targets contain i or j (for Type1B, j and a neighbor of i, which is the center of the pair),
+        since the removals depend only on the targets and the lattice.
+        Args:
+            i (int): control qubit
+            j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        Returns:
+            index (TargetIndex): index of the list of the targets
+        """
+        context = self.context if context is None else context
+        key = ("edge", type(self).__name__, getattr(self, "safe_mode", None), i, j)
+        cache = context.lattice.cache
+        if key not in cache:
+            targets = []
+            for t in dict.fromkeys(self.get_index(i, context).targets + self.get_index(j, context).targets):
+                rnodes, redges = self.remove(*t, context=context)
+                if (i in rnodes) or (j in rnodes) or ((i,j) in redges):
+                    targets.append(t)
+            cache.setdefault(key, TargetIndex(targets))
+        return cache[key]
+
+    def get_value(self, target, key, context=None):
+        """get the desired value from node_info or edge_info of the context or self.default
         Args:
             target (int or tuple): label of the node or edge
             key (str): name of the values you want to get
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
+        context = self.context if context is None else context
         if type(target) is tuple:
-            if (target in self.edge_info.keys()):
-                if key in self.edge_info[target].keys():
-                    return self.edge_info[target][key]
-            return self.default[key]
+            info = context.edge_info.get(target)
+        else:
+            info = context.node_info.get(target)
+        if (info is not None) and (key in info):
+            return info[key]
+        return self.default[key]
+
+    def get_coupling(self, i, j, context=None):
+        """get the coupling between the nearest or next nearest neighbors
+        Args:
+            i (int): node label
+            j (int): node label
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        """
+        context = self.context if context is None else context
+        if context.lattice.distance(i, j) == 1:
+            return self.get_value((i,j), "coupling", context)
+        return self.get_value((i,j), "nnn_coupling", context)
+
+    def get_values(self, targets, context=None):
+        """get the values for the collision kernel, looked up only when the kernel uses them
+        Args:
+            targets (tuple or list or TargetIndex): labels of the target qubits, or list of them
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        Returns:
+            values (dict): dictionary of the values (arrays if targets is a list)
+        """
+        context = self.context if context is None else context
+        if type(targets) is tuple:
+            return Values(self, context, targets)
+        if type(targets) is not TargetIndex:
+            targets = TargetIndex(targets)
+        return ArrayValues(self, context, targets)
+
+    def margin(self, *targets, context=None):
+        """get the margin of the collision (negative if the targets are in collision)
+        Args:
+            targets (tuple): labels of the target qubits
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        Returns:
+            margin (float): margin of the collision in MHz (np.inf if not applicable)
+        """
+        if not self.applicable(*targets, context=context):
+            return np.inf
+        return self.kernel(self.get_values(targets, context))
+
+    def margins(self, targets, context=None):
+        """get the margins of the collision for many targets at once
+        Args:
+            targets (list or TargetIndex): list of the tuples of the target qubit labels
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        Returns:
+            margins (np.ndarray): margins of the collision in MHz (np.inf if not applicable)
+        """
+        if type(targets) is TargetIndex:
+            index = targets
+        else:
+            mask = np.array([self.applicable(*t, context=context) for t in targets], dtype=bool)
+            index = TargetIndex([t for t, m in zip(targets, mask) if m])
+        if len(index) == 0:
+            return np.full(len(targets), np.inf)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            margins = np.broadcast_to(self.kernel(self.get_values(index, context)), (len(index),))
+        if type(targets) is TargetIndex:
+            return margins
+        full = np.full(len(targets), np.inf)
+        full[mask] = margins
+        return full
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        raise NotImplementedError
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        raise NotImplementedError
+
+def get_condition_spec(condition):
+    """describe the conditions without the lattice and the calibration set to them
+    Args:
+        condition (list): list of the collision conditions
+    Returns:
+        spec (list): list of (class, default, safe_mode) of the conditions
+    """
+    return [(type(col), dict(col.default), getattr(col, "safe_mode", None)) for col in condition]
+
+def make_condition_from_spec(spec):
+    """make the fresh conditions from their description
+    Args:
+        spec (list): list of (class, default, safe_mode) given by get_condition_spec
+    Returns:
+        condition (list): list of the collision conditions
+    """
+    condition = []
+    for cls, default, safe_mode in spec:
+        if safe_mode is None:
+            condition.append(cls(default))
+        else:
+            condition.append(cls(default, safe_mode=safe_mode))
+    return condition
+
+class Values(dict):
+    """Dictionary of the values of the targets for the collision kernel"""
+
+    def __init__(self, collision, context, targets):
+        """Initailize the Class
+        Args:
+            collision (FrequencyCollision): collision condition
+            context (Context): lattice and calibration
+            targets (tuple): labels of the target qubits
+        """
+        super().__init__()
+        self.collision = collision
+        self.context = context
+        self.targets = targets
+
+    def lookup(self, name, label):
+        """look up the value of the node or the pair
+        Args:
+            name (str): argument name of the collision kernel (see VALUE_KEYS)
+            label (int or tuple): label of the node or the pair
+        """
+        key = VALUE_KEYS[name][1]
+        if key is None:
+            return self.collision.get_coupling(*label, context=self.context)
+        return self.collision.get_value(label, key, self.context)
+
+    def __missing__(self, name):
+        pos = VALUE_KEYS[name][0]
+        if type(pos) is tuple:
+            label = (self.targets[pos[0]], self.targets[pos[1]])
         else:
-            if (target in self.node_info.keys()):
-                if key in self.node_info[target].keys():
-                    return self.node_info[target][key]
-            return self.default[key]
+            label = self.targets[pos]
+        self[name] = np.float64(self.lookup(name, label))
+        return self[name]
+
+class ArrayValues(Values):
+    """Dictionary of the value arrays of the list of targets for the collision kernel"""
+
+    def __init__(self, collision, context, targets):
+        """Initailize the Class
+        Args:
+            collision (FrequencyCollision): collision condition
+            context (Context): lattice and calibration
+            targets (TargetIndex): index of the list of the targets
+        """
+        super().__init__(collision, context, targets)
+
+    def __missing__(self, name):
+        # the values are looked up once per node or pair and spread over the targets
+        unique, inverse = self.targets.get(VALUE_KEYS[name][0])
+        values = np.array([self.lookup(name, label) for label in unique], dtype=float)
+        self[name] = values[inverse]
+        return self[name]
 
 class Type0A(FrequencyCollision):
     """
@@ -98,6 +371,7 @@ class Type0A(FrequencyCollision):
         removals:
             i
     """
+    piecewise_linear = True
 
     def __init__(self, default=None):
         """Initailize the Class
@@ -108,28 +382,38 @@ class Type0A(FrequencyCollision):
         self.name = "Type0A"
         self.note = "bad or dead qubits"
         self.body = 1
+        self.distances = [()]
 
-    def check(self, i):
+    def check(self, i, context=None):
         """check the collision for target
         Args:
             i (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        wi = self.get_value(i, "frequency")
-        ai = self.get_value(i, "anharmonicity")
-        t1 = self.get_value(i, "t1")
-        t2 = self.get_value(i, "t2_echo")
-        wmax = self.get_value(i, "max_frequency")
-        wmin = self.get_value(i, "min_frequency")
-        t1min = self.get_value(i, "min_t1")
-        t2min = self.get_value(i, "min_t2")
-        if (wi < wmin) or (wi > wmax) or np.isnan(wi) or np.isnan(ai) or (t1 < t1min) or (t2 < t2min):
-            return True
-        return False
-    
-    def remove(self, i):
+        return bool(self.margin(i, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi = v["wi"]
+        margin = np.minimum(wi - v["wmin"], v["wmax"] - wi)
+        bad = np.isnan(wi) | np.isnan(v["ai"]) | (v["t1"] < v["t1min"]) | (v["t2"] < v["t2min"])
+        return np.fmin(margin, np.where(bad, -np.inf, np.inf))
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        return [v["wi"] - v["wmin"], v["wmax"] - v["wi"]]
+
+    def remove(self, i, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = [i]
         removal_edge = []
@@ -149,6 +433,8 @@ class Type0B(FrequencyCollision):
         removals:
             (i,j), (j,i)
     """
+    piecewise_linear = True
+
     def __init__(self, default=None):
         """Initailize the Class
         Args:
@@ -158,26 +444,39 @@ class Type0B(FrequencyCollision):
         self.name = "Type0B"
         self.note = "too large detuning"
         self.body = 2
+        self.distances = [(1,)]
 
-    def check(self, i,j):
+    def check(self, i,j, context=None):
         """check the collision for target
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        wi = self.get_value(i, "frequency")
-        wj = self.get_value(j, "frequency")
-        dmax = self.get_value((i,j), "max_detuning")
-        if (dij == 1) and abs(wi-wj) > dmax:
-            return True
-        return False
-    
-    def remove(self, i, j):
+        return bool(self.margin(i, j, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        deff = v["wi"] - v["wj"]
+        return v["dmax"] - abs(deff)
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        deff = v["wi"] - v["wj"]
+        return [deff - v["dmax"], deff + v["dmax"]]
+
+    def remove(self, i, j, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = [(i,j), (j,i)]
@@ -197,6 +496,9 @@ class Type1A(FrequencyCollision):
         removals:
             i,j
     """
+    static_coupling = True
+    piecewise_linear = True
+
     def __init__(self, default=None):
         """Initailize the Class
         Args:
@@ -206,32 +508,38 @@ class Type1A(FrequencyCollision):
         self.name = "Type1A"
         self.note = "ge(i) - ge(j)"
         self.body = 2
+        self.distances = [(1,), (2,)]
 
-    def check(self, i,j):
+    def check(self, i,j, context=None):
         """check the collision for target
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        wi = self.get_value(i, "frequency")
-        wj = self.get_value(j, "frequency")
-        deff = wi - wj
-        if dij == 1:
-            gij = self.get_value((i,j), "coupling")
-            collision = (2*abs(gij) > self.b1*abs(deff))
-            return collision
-        if dij == 2:
-            gij = self.get_value((i,j), "nnn_coupling")
-            collision = (2*abs(gij) > self.b1*abs(deff))
-            return collision
-        return False
-    
-    def remove(self, i, j):
+        return bool(self.margin(i, j, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        deff = v["wi"] - v["wj"]
+        return self.b1*abs(deff) - 2*abs(v["gij"])
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        return [v["wi"] - v["wj"]]
+
+    def remove(self, i, j, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = [i,j]
         removal_edge = []
@@ -251,6 +559,7 @@ class Type1B(FrequencyCollision):
         removals:
             (k>i), (k>j) for k is the nearest neighbor of i and j
     """
+    piecewise_linear = True
 
     def __init__(self, default=None):
         """Initailize the Class
@@ -261,34 +570,44 @@ class Type1B(FrequencyCollision):
         self.name = "Type1B"
         self.note = "CR(k>i) - CR(k>j)"
         self.body = 2
+        self.distances = [(2,)]
         
-    def check(self, i,j):
+    def check(self, i,j, context=None):
         """check the collision for target
         Args:
             i (int): control qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        wi = self.get_value(i, "frequency")
-        wj = self.get_value(j, "frequency")
-        deff = wi - wj
-        if dij == 2:
-            collision = (self.ozx > self.b1*abs(deff))
-            return collision
-        return False
-    
-    def remove(self, i, j):
+        return bool(self.margin(i, j, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        deff = v["wi"] - v["wj"]
+        return self.b1*abs(deff) - self.ozx
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        return [v["wi"] - v["wj"]]
+
+    def remove(self, i, j, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): control qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = []
-        for k in self.nodes:
-            dik = nx.shortest_path_length(self.graph, i, k)
-            djk = nx.shortest_path_length(self.graph, j, k)
-            if (dik == 1) and (djk == 1):
+        context = self.context if context is None else context
+        for k in context.lattice.shells[i][1]:
+            if context.lattice.distance(j, k) == 1:
                 removal_edge.append((k,i))
                 removal_edge.append((k,j))
         return removal_node, removal_edge
@@ -317,33 +636,41 @@ class Type1C(FrequencyCollision):
         self.name = "Type1C"
         self.note = "ge(i) - CR(i>j)"
         self.body = 2
+        self.distances = [(1,)]
         
-    def check(self, i,j):
+    def check(self, i,j, context=None):
         """check the collision for target
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        if dij == 1:
-            wi = self.get_value(i, "frequency")
-            wj = self.get_value(j, "frequency")
-            ai = self.get_value(i, "anharmonicity")
-            gij = self.get_value((i,j), "coupling")
-            oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
-            deff = wi - wj
-            geff = oi
-            collision = (abs(geff) > self.bc*abs(deff))
-            # print(self.note, collision, (i,j), oi, geff, deff)
-            return collision
-        else:
-            return False
+        return bool(self.margin(i, j, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai, gij = v["wi"], v["wj"], v["ai"], v["gij"]
+        oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
+        deff = wi - wj
+        geff = oi
+        return self.bc*abs(deff) - abs(geff)
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        return [v["wi"] - v["wj"], v["wi"] + v["ai"] - v["wj"]]
 
-    def remove(self, i, j):
+    def remove(self, i, j, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = [(i,j)]
@@ -372,32 +699,42 @@ class Type2A(FrequencyCollision):
         self.name = "Type2A"
         self.note = "gf/2(i) in CR(i>j)"
         self.body = 2
+        self.distances = [(1,)]
         
-    def check(self, i,j):
+    def check(self, i,j, context=None):
         """check the collision for target
         Args:
             i (int): control qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        if dij == 1:
-            wi = self.get_value(i, "frequency")
-            wj = self.get_value(j, "frequency")
-            ai = self.get_value(i, "anharmonicity")
-            gij = self.get_value((i,j), "coupling")
-            oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
-            deff = 2*wi + ai - 2*wj
-            geff = abs(2**(-1.5)*oi**2*(1/((wi+ai)-wj)-1/(wi-wj)))
-            collision = (abs(geff) > self.b1*abs(deff))
-            return collision
-        else:
-            return False
-    
-    def remove(self, i, j):
+        return bool(self.margin(i, j, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai, gij = v["wi"], v["wj"], v["ai"], v["gij"]
+        oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
+        deff = 2*wi + ai - 2*wj
+        geff = abs(2**(-1.5)*oi**2*(1/((wi+ai)-wj)-1/(wi-wj)))
+        return self.b1*abs(deff) - abs(geff)
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai = v["wi"], v["wj"], v["ai"]
+        return [wi - wj, wi + ai - wj, 2*wi + ai - 2*wj]
+
+    def remove(self, i, j, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): control qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = [(i,j)]
@@ -426,32 +763,42 @@ class Type2B(FrequencyCollision):
         self.name = "Type2B"
         self.note = "fogi(i>j) in CR(i>j)"
         self.body = 2
+        self.distances = [(1,)]
         
-    def check(self, i,j):
+    def check(self, i,j, context=None):
         """check the collision for target
         Args:
             i (int): control qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        if dij == 1:
-            wi = self.get_value(i, "frequency")
-            wj = self.get_value(j, "frequency")
-            ai = self.get_value(i, "anharmonicity")
-            gij = self.get_value((i,j), "coupling")
-            oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
-            deff = 2*wi + ai - 2*wj
-            geff = 2**0.5*gij*oi*(1/(wi-wj)+1/(wj-(wi+ai)))
-            collision = (abs(geff) > self.b1*abs(deff))
-            return collision
-        else:
-            return False
-    
-    def remove(self, i, j):
+        return bool(self.margin(i, j, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai, gij = v["wi"], v["wj"], v["ai"], v["gij"]
+        oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
+        deff = 2*wi + ai - 2*wj
+        geff = 2**0.5*gij*oi*(1/(wi-wj)+1/(wj-(wi+ai)))
+        return self.b1*abs(deff) - abs(geff)
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai = v["wi"], v["wj"], v["ai"]
+        return [wi - wj, wi + ai - wj, 2*wi + ai - 2*wj]
+
+    def remove(self, i, j, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): control qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = [(i,j)]
@@ -474,6 +821,9 @@ class Type3A(FrequencyCollision):
             else:
                 (i,j), (j,i)
     """
+    static_coupling = True
+    piecewise_linear = True
+
     def __init__(self, default=None, safe_mode=False):
         """Initailize the Class
         Args:
@@ -484,36 +834,40 @@ class Type3A(FrequencyCollision):
         self.name = "Type3A"
         self.note = "ef(i) - ge(j)"
         self.body = 2
+        self.distances = [(1,), (2,)]
         self.safe_mode = safe_mode
         
-    def check(self, i,j):
+    def check(self, i,j, context=None):
         """check the collision for target
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        wi = self.get_value(i, "frequency")
-        wj = self.get_value(j, "frequency")
-        ai = self.get_value(i, "anharmonicity")
-        deff = wi + ai - wj
-        if dij == 1:
-            gij = self.get_value((i,j), "coupling")
-            geff = 2**1.5 * gij
-            collision = (abs(geff) > self.b1*abs(deff))
-            return collision
-        if dij == 2:
-            gij = self.get_value((i,j), "nnn_coupling")
-            geff = 2**1.5 * gij
-            collision = (abs(geff) > self.b1*abs(deff))
-            return collision
-        return False
-
-    def remove(self, i, j):
+        return bool(self.margin(i, j, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        deff = v["wi"] + v["ai"] - v["wj"]
+        geff = 2**1.5 * v["gij"]
+        return self.b1*abs(deff) - abs(geff)
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        return [v["wi"] + v["ai"] - v["wj"]]
+
+    def remove(self, i, j, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         if self.safe_mode:
             removal_node = [i,j]
@@ -547,33 +901,41 @@ class Type3B(FrequencyCollision):
         self.name = "Type3B"
         self.note = "ef(i) - CR(i>j)"
         self.body = 2
+        self.distances = [(1,)]
         
-    def check(self, i,j):
+    def check(self, i,j, context=None):
         """check the collision for target
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        if dij == 1:
-            wi = self.get_value(i, "frequency")
-            wj = self.get_value(j, "frequency")
-            ai = self.get_value(i, "anharmonicity")
-            gij = self.get_value((i,j), "coupling")
-            oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
-            deff = wi + ai - wj
-            geff = 2**0.5 * oi
-            collision = (abs(geff) > self.bc*abs(deff))
-            # print(self.note, collision, (i,j), oi, geff, deff)
-            return collision
-        else:
-            return False
+        return bool(self.margin(i, j, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai, gij = v["wi"], v["wj"], v["ai"], v["gij"]
+        oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
+        deff = wi + ai - wj
+        geff = 2**0.5 * oi
+        return self.bc*abs(deff) - abs(geff)
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        return [v["wi"] - v["wj"], v["wi"] + v["ai"] - v["wj"]]
 
-    def remove(self, i, j):
+    def remove(self, i, j, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): target qubit
             j (int): target qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = [(i,j)]
@@ -603,37 +965,45 @@ class Type7(FrequencyCollision):
         self.name = "Type7"
         self.note = "fogi(i>k) in CR(i>j)"
         self.body = 3
+        self.distances = [(1, 1)]
         
-    def check(self, i,j,k):
+    def check(self, i,j,k, context=None):
         """check the collision for target
         Args:
             i (int): control qubit
             j (int): target qubit
             k (int): spectator qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        dik = nx.shortest_path_length(self.graph, i, k)
-        if dij == dik == 1:
-            wi = self.get_value(i, "frequency")
-            wj = self.get_value(j, "frequency")
-            wk = self.get_value(k, "frequency")
-            ai = self.get_value(i, "anharmonicity")
-            gij = self.get_value((i,j), "coupling")
-            gik = self.get_value((i,k), "coupling")
-            oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
-            deff = 2*wi + ai - (wj + wk)
-            geff = 2**(-0.5)*gik*oi*(1/(wi+ai-wj)+1/(wi+ai-wk)-1/(wi-wj)-1/(wi-wk))
-            collision = (abs(geff) > self.b1*abs(deff))
-            return collision
-        else:
-            return False
-           
-    def remove(self, i, j, k):
+        return bool(self.margin(i, j, k, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai, gij = v["wi"], v["wj"], v["ai"], v["gij"]
+        oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
+        wk, gik = v["wk"], v["gik"]
+        deff = 2*wi + ai - (wj + wk)
+        geff = 2**(-0.5)*gik*oi*(1/(wi+ai-wj)+1/(wi+ai-wk)-1/(wi-wj)-1/(wi-wk))
+        return self.b1*abs(deff) - abs(geff)
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, wk, ai = v["wi"], v["wj"], v["wk"], v["ai"]
+        return [wi - wj, wi - wk, wi + ai - wj, wi + ai - wk, 2*wi + ai - (wj + wk)]
+
+    def remove(self, i, j, k, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): control qubit
             j (int): target qubit
             k (int): spectator qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = [(i,j)]
@@ -663,37 +1033,45 @@ class Type8(FrequencyCollision):
         self.name = "Type8"
         self.note = "ge(i)@CR(i>j) - ge(k)"
         self.body = 3
+        self.distances = [(1, 2)]
         
-    def check(self, i,j,k):
+    def check(self, i,j,k, context=None):
         """check the collision for target
         Args:
             i (int): control qubit
             j (int): target qubit
             k (int): spectator qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        dik = nx.shortest_path_length(self.graph, i, k)
-        
-        if (dij == 1) and (dik == 2):
-            wi = self.get_value(i, "frequency")
-            wj = self.get_value(j, "frequency")
-            wk = self.get_value(k, "frequency")
-            ai = self.get_value(i, "anharmonicity")
-            gij = self.get_value((i,j), "coupling")
-            oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
-            deff = wi - wk
-            geff = oi**2*ai/(2*(wi-wj)*(wi+ai-wj))
-            collision = (deff*(deff+geff) < 0)
-            return collision
-        else:
-            return False
-        
-    def remove(self, i, j, k):
+        return bool(self.margin(i, j, k, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai, gij = v["wi"], v["wj"], v["ai"], v["gij"]
+        oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
+        deff = wi - v["wk"]
+        geff = oi**2*ai/(2*(wi-wj)*(wi+ai-wj))
+        # negative while the shifted ge(i) crosses the spectator transition
+        return deff*(deff+geff)/(abs(deff)+abs(deff+geff))
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai = v["wi"], v["wj"], v["ai"]
+        return [wi - wj, wi + ai - wj, wi - v["wk"]]
+
+    def remove(self, i, j, k, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): control qubit
             j (int): target qubit
             k (int): spectator qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = [(i,j)]
@@ -723,38 +1101,45 @@ class Type9(FrequencyCollision):
         self.name = "Type9"
         self.note = "ge(i)@CR(i>j) - ef(k)"
         self.body = 3
+        self.distances = [(1, 2)]
         
-    def check(self, i,j,k):
+    def check(self, i,j,k, context=None):
         """check the collision for target
         Args:
             i (int): control qubit
             j (int): target qubit
             k (int): spectator qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
-        dij = nx.shortest_path_length(self.graph, i, j)
-        dik = nx.shortest_path_length(self.graph, i, k)
-        
-        if (dij == 1) and (dik == 2):
-            wi = self.get_value(i, "frequency")
-            wj = self.get_value(j, "frequency")
-            wk = self.get_value(k, "frequency")
-            ai = self.get_value(i, "anharmonicity")
-            ak = self.get_value(k, "anharmonicity")
-            gij = self.get_value((i,j), "coupling")
-            oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
-            deff = wi - (wk + ak)
-            geff = oi**2*ai/(2*(wi-wj)*(wi+ai-wj))
-            collision = (deff*(deff+geff) < 0)
-            return collision
-        else:
-            return False
-        
-    def remove(self, i, j, k):
+        return bool(self.margin(i, j, k, context=context) < 0)
+
+    def kernel(self, v):
+        """calculate the margin of the collision from the values
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai, gij = v["wi"], v["wj"], v["ai"], v["gij"]
+        oi = self.ozx*abs((wi-wj)*(wi+ai-wj)/(gij*ai))
+        deff = wi - (v["wk"] + v["ak"])
+        geff = oi**2*ai/(2*(wi-wj)*(wi+ai-wj))
+        # negative while the shifted ge(i) crosses the spectator transition
+        return deff*(deff+geff)/(abs(deff)+abs(deff+geff))
+
+    def resonance(self, v):
+        """list up the linear forms of the frequencies whose zeros bound the collision windows
+        Args:
+            v (dict): dictionary of the values (see VALUE_KEYS)
+        """
+        wi, wj, ai = v["wi"], v["wj"], v["ai"]
+        return [wi - wj, wi + ai - wj, wi - (v["wk"] + v["ak"])]
+
+    def remove(self, i, j, k, context=None):
         """remove the corresponding nodes or edges of the collision
         Args:
             i (int): control qubit
             j (int): target qubit
             k (int): spectator qubit
+            context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
         """
         removal_node = []
         removal_edge = [(i,j)]
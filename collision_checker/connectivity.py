@@ -0,0 +1,306 @@
+import itertools
+from collections import deque
+
+class DisjointSet:
+    """
+    Class of Disjoint Set labeling each element with its set
+
+        The union relabels the smaller set, so that every element is relabeled O(log N) times
+        while the sets are merged, and the sets can be split by moving their elements to new labels.
+    """
+
+    def __init__(self):
+        """Initailize the Class"""
+        self.root = {}
+        self.size = {}
+        self.edge = {}
+        self.members = {}
+        self.labels = itertools.count()
+
+    def __contains__(self, x):
+        return x in self.root
+
+    def add(self, x):
+        """add the element as a singleton set
+        Args:
+            x (int): element
+        """
+        if x not in self.root:
+            root = next(self.labels)
+            self.root[x] = root
+            self.size[root] = 1
+            self.edge[root] = 0
+            self.members[root] = {x}
+
+    def find(self, x):
+        """find the label of the set containing the element
+        Args:
+            x (int): element
+        Returns:
+            root (int): label of the set
+        """
+        return self.root[x]
+
+    def union(self, x, y):
+        """merge the sets containing the elements and count the edge between them
+        Args:
+            x (int): element
+            y (int): element
+        Returns:
+            root (int): label of the merged set
+        """
+        rx = self.root[x]
+        ry = self.root[y]
+        if rx == ry:
+            self.edge[rx] += 1
+            return rx
+        if self.size[rx] < self.size[ry]:
+            rx, ry = ry, rx
+        members = self.members.pop(ry)
+        for z in members:
+            self.root[z] = rx
+        self.members[rx] |= members
+        self.size[rx] += self.size.pop(ry)
+        self.edge[rx] += self.edge.pop(ry) + 1
+        return rx
+
+    def discard(self, x):
+        """remove the element from its set
+        Args:
+            x (int): element
+        """
+        root = self.root.pop(x)
+        self.members[root].remove(x)
+        self.size[root] -= 1
+        if self.size[root] == 0:
+            del self.members[root], self.size[root], self.edge[root]
+
+    def split(self, piece, edge=0):
+        """move the elements out of their set into a new set
+        Args:
+            piece (list): list of the elements in the same set
+            edge (int): number of the edges moved together
+        Returns:
+            root (int): label of the new set
+        """
+        old = self.root[piece[0]]
+        root = next(self.labels)
+        self.members[old] -= set(piece)
+        self.size[old] -= len(piece)
+        self.edge[old] -= edge
+        for x in piece:
+            self.root[x] = root
+        self.members[root] = set(piece)
+        self.size[root] = len(piece)
+        self.edge[root] = edge
+        return root
+
+class SafeLattice:
+    """
+    Class of Safe Lattice with its connectivity
+
+        The nodes and edges removed by each collision are counted, so that the collisions can be
+        added or resolved one by one. The connected components of the safe lattice are kept in
+        a DisjointSet: resolving a collision merges the components incrementally, while adding
+        a collision splits off only the pieces found by the searches from the removed node or edge.
+        Two safe nodes are connected when CR is usable in either direction between them.
+    """
+
+    def __init__(self, nodes, edges, context=None):
+        """Initailize the Class
+        Args:
+            nodes (list): list of the node labels
+            edges (list): list of the edge labels
+            context (Context): lattice and calibration used for the removals
+        """
+        self.nodes = list(nodes)
+        self.context = context
+        self.edges = []
+        self.adjacency = {i: [] for i in self.nodes}
+        for i in edges:
+            for e in [i, (i[1], i[0])]:
+                self.edges.append(e)
+                self.adjacency[e[0]].append(e)
+                self.adjacency[e[1]].append(e)
+        self.removal_node = {i: 0 for i in self.nodes}
+        self.removal_edge = {i: 0 for i in self.edges}
+        self.dsu = None
+
+    def is_safe_node(self, i):
+        """whether the node is not removed by any collision
+        Args:
+            i (int): node label
+        """
+        return self.removal_node[i] == 0
+
+    def is_safe_edge(self, e):
+        """whether the edge and its both nodes are not removed by any collision
+        Args:
+            e (tuple): edge label
+        """
+        return self.removal_edge[e] == 0 and self.is_safe_node(e[0]) and self.is_safe_node(e[1])
+
+    @property
+    def safe_nodes(self):
+        """list of the safe node labels"""
+        return [i for i in self.nodes if self.is_safe_node(i)]
+
+    @property
+    def safe_edges(self):
+        """list of the safe edge labels"""
+        return [e for e in self.edges if self.is_safe_edge(e)]
+
+    def add_collision(self, collision, targets):
+        """remove the nodes and edges of the collision from the safe lattice
+        Args:
+            collision (FrequencyCollision): collision condition
+            targets (tuple): labels of the target qubits in collision
+        """
+        rnodes, redges = collision.remove(*targets, context=self.context)
+        for i in set(rnodes):
+            self.removal_node[i] += 1
+            if self.removal_node[i] == 1 and self.dsu is not None:
+                # the edges of the node which were safe before the removal
+                lost = [e for e in self.adjacency[i] if self.removal_edge[e] == 0 and self.is_safe_node(e[1] if e[0] == i else e[0])]
+                self.dsu.edge[self.dsu.find(i)] -= len(lost)
+                self.dsu.discard(i)
+                self.separate([e[1] if e[0] == i else e[0] for e in lost])
+        for e in set(redges):
+            if e in self.removal_edge:
+                self.removal_edge[e] += 1
+                if self.removal_edge[e] == 1 and self.dsu is not None and self.is_safe_node(e[0]) and self.is_safe_node(e[1]):
+                    self.dsu.edge[self.dsu.find(e[0])] -= 1
+                    if not self.is_safe_edge((e[1], e[0])):
+                        self.separate(list(e))
+
+    def neighbors(self, i):
+        """safe nodes connected to the safe node by a safe edge in either direction
+        Args:
+            i (int): node label
+        """
+        for e in self.adjacency[i]:
+            if self.is_safe_edge(e):
+                yield e[1] if e[0] == i else e[0]
+
+    def separate(self, starts):
+        """label the pieces split from the component of the nodes by a removal as new components
+        The searches from the nodes run in turn and merge when they meet, so that only the pieces
+        other than the last one are searched to the end.
+        Args:
+            starts (list): list of the safe node labels which were in the same component
+        """
+        starts = list(dict.fromkeys(starts))
+        owner = {i: k for k, i in enumerate(starts)}
+        group = list(range(len(starts)))
+        queues = {k: deque([i]) for k, i in enumerate(starts)}
+        visited = {k: [i] for k, i in enumerate(starts)}
+        pieces = []
+        while len(queues) > 1:
+            for k in list(queues):
+                if k not in queues or len(queues) == 1:
+                    continue
+                if not queues[k]:
+                    pieces.append(visited.pop(k))
+                    del queues[k]
+                    continue
+                i = queues[k].popleft()
+                for j in self.neighbors(i):
+                    if j not in owner:
+                        owner[j] = k
+                        visited[k].append(j)
+                        queues[k].append(j)
+                        continue
+                    h = owner[j]
+                    while group[h] != h:
+                        h = group[h]
+                    if h != k:
+                        # the searches met, so that they are in the same piece
+                        group[h] = k
+                        queues[k] += queues.pop(h)
+                        visited[k] += visited.pop(h)
+        for piece in pieces:
+            edge = sum(1 for i in piece for e in self.adjacency[i] if e[0] == i and self.is_safe_edge(e))
+            self.dsu.split(piece, edge)
+
+    def resolve_collision(self, collision, targets):
+        """restore the nodes and edges of the resolved collision to the safe lattice
+        Args:
+            collision (FrequencyCollision): collision condition
+            targets (tuple): labels of the target qubits which were in collision
+        """
+        rnodes, redges = collision.remove(*targets, context=self.context)
+        for i in set(rnodes):
+            self.removal_node[i] -= 1
+            if self.removal_node[i] == 0 and self.dsu is not None:
+                self.dsu.add(i)
+                for e in self.adjacency[i]:
+                    if self.is_safe_edge(e):
+                        self.dsu.union(*e)
+        for e in set(redges):
+            if e in self.removal_edge:
+                self.removal_edge[e] -= 1
+                if self.removal_edge[e] == 0 and self.dsu is not None and self.is_safe_edge(e):
+                    self.dsu.union(*e)
+
+    def add_collision_info(self, collision_info):
+        """remove the nodes and edges of all the collisions from the safe lattice
+        Args:
+            collision_info (dict): dictionary of the collision information
+        """
+        for collision, i in collision_info.items():
+            for j in i:
+                self.add_collision(collision, j)
+
+    def get_disjoint_set(self):
+        """get the disjoint set of the safe lattice, built on the first query
+        Returns:
+            dsu (DisjointSet): disjoint set of the safe nodes
+        """
+        if self.dsu is None:
+            self.dsu = DisjointSet()
+            for i in self.safe_nodes:
+                self.dsu.add(i)
+            for e in self.safe_edges:
+                self.dsu.union(*e)
+        return self.dsu
+
+    def components(self):
+        """connected components of the safe lattice
+        Returns:
+            components (list): list of the sets of the node labels, sorted by size in descending order
+        """
+        dsu = self.get_disjoint_set()
+        return sorted((set(members) for members in dsu.members.values()), key=len, reverse=True)
+
+    def largest_component(self):
+        """largest connected component of the safe lattice
+        Returns:
+            component (set): set of the node labels (empty if there is no safe node)
+        """
+        dsu = self.get_disjoint_set()
+        if not dsu.size:
+            return set()
+        root = max(dsu.size, key=dsu.size.get)
+        return set(dsu.members[root])
+
+    def component_size(self, i):
+        """size of the connected component containing the node
+        Args:
+            i (int): node label
+        Returns:
+            n (int): number of the safe nodes (0 if the node is removed)
+            m (int): number of the safe edges
+        """
+        dsu = self.get_disjoint_set()
+        if i not in dsu:
+            return 0, 0
+        root = dsu.find(i)
+        return dsu.size[root], dsu.edge[root]
+
+    def component_sizes(self):
+        """sizes of the connected components of the safe lattice
+        Returns:
+            sizes (list): list of (number of the safe nodes, number of the safe edges), sorted by the number of the nodes in descending order
+        """
+        dsu = self.get_disjoint_set()
+        return sorted(((dsu.size[r], dsu.edge[r]) for r in dsu.size), reverse=True)
@@ -0,0 +1,193 @@
+import itertools
+from types import MappingProxyType
+import numpy as np
+
+class Lattice:
+    """
+    Class of Lattice with the distance index up to 2
+
+        No condition looks beyond the distance 2, so only the shells of the radius 2 are kept.
+        The lattice is not changed after the initialization. The lists of the targets are cached
+        on the first use, which gives the same result whichever thread fills the cache.
+    """
+
+    def __init__(self, nodes, edges, shells=None):
+        """Initailize the Class
+        Args:
+            nodes (list): list of the node labels = [0,1,2...]
+            edges (list): list of the edge labels = [(0,1), (1,2), ...]
+            shells (dict): dictionary of the shells {i: {1: (...), 2: (...)}} computed before (computed from the edges if None)
+        """
+        self.nodes = tuple(nodes)
+        self.edges = tuple(tuple(e) for e in edges)
+        self.index = {node: idx for idx, node in enumerate(self.nodes)}
+        if shells is None:
+            adjacency = {node: set() for node in self.nodes}
+            for i, j in self.edges:
+                adjacency[i].add(j)
+                adjacency[j].add(i)
+            shells = {}
+            for i in self.nodes:
+                shell1 = adjacency[i]
+                shell2 = set()
+                for j in shell1:
+                    shell2 |= adjacency[j]
+                shell2 -= shell1 | {i}
+                shells[i] = {
+                    1 : tuple(sorted(shell1, key=self.index.__getitem__)),
+                    2 : tuple(sorted(shell2, key=self.index.__getitem__)),
+                }
+        self.shells = shells
+        self.distance_index = {}
+        for i in self.nodes:
+            self.distance_index[i] = {i: 0}
+            self.distance_index[i].update({j: 1 for j in shells[i][1]})
+            self.distance_index[i].update({j: 2 for j in shells[i][2]})
+        self.cache = {}
+
+    def distance(self, i, j):
+        """get the distance between the nodes on the graph (np.inf if it is beyond 2)
+        Args:
+            i (int): node label
+            j (int): node label
+        """
+        return self.distance_index[i].get(j, np.inf)
+
+    def candidates(self, distances, i):
+        """list up the targets starting from the node with the given distances
+        Args:
+            distances (list): list of the distances from the first target to the others
+            i (int): label of the first target qubit
+        Returns:
+            candidates (list): list of the targets in the same order as itertools.permutations
+        """
+        candidates = []
+        for dist in distances:
+            for rest in itertools.product(*[self.shells[i][d] for d in dist]):
+                if len(set(rest)) == len(rest):
+                    candidates.append((i,) + rest)
+        candidates.sort(key=lambda t: [self.index[x] for x in t])
+        return candidates
+
+    def candidates_with(self, distances, q):
+        """list up the targets containing the node with the given distances
+        Args:
+            distances (list): list of the distances from the first target to the others
+            q (int): node label
+        Returns:
+            candidates (list): list of the targets, where q can be at any position
+        """
+        candidates = []
+        for dist in distances:
+            for pos in range(len(dist) + 1):
+                anchors = [q] if pos == 0 else self.shells[q][dist[pos-1]]
+                for i in anchors:
+                    shells = [[q] if p == pos else self.shells[i][d] for p, d in enumerate(dist, start=1)]
+                    for rest in itertools.product(*shells):
+                        if len(set(rest)) == len(rest):
+                            candidates.append((i,) + rest)
+        return candidates
+
+    def get_index(self, distances, q=None):
+        """get the cached index of the targets with the given distances
+        Args:
+            distances (list): list of the distances from the first target to the others
+            q (int): node label contained in the targets (all the targets in the lattice if None)
+        Returns:
+            index (TargetIndex): index of the list of the targets
+        """
+        key = (tuple(distances), q)
+        if key not in self.cache:
+            if q is None:
+                targets = [t for i in self.nodes for t in self.candidates(distances, i)]
+            else:
+                targets = self.candidates_with(distances, q)
+            self.cache.setdefault(key, TargetIndex(targets))
+        return self.cache[key]
+
+    def get_shell_array(self, d):
+        """get the cached array of the shells with the given distance
+        Args:
+            d (int): distance of the shells (1 or 2)
+        Returns:
+            shells (np.ndarray): array of the node indices in the shell of each node, padded with -1
+        """
+        key = ("shell", d)
+        if key not in self.cache:
+            width = max((len(self.shells[i][d]) for i in self.nodes), default=0)
+            shells = np.full((len(self.nodes), width), -1, dtype=int)
+            for idx, i in enumerate(self.nodes):
+                shells[idx, :len(self.shells[i][d])] = [self.index[j] for j in self.shells[i][d]]
+            self.cache.setdefault(key, shells)
+        return self.cache[key]
+
+class Context:
+    """
+    Class of Context holding the lattice and the calibration
+
+        The node_info and edge_info are copied into read-only mappings, so that a context is a
+        snapshot which can be shared by the threads evaluating the collisions.
+    """
+
+    def __init__(self, lattice, node_info, edge_info=None, freeze=True):
+        """Initailize the Class
+        Args:
+            lattice (Lattice): lattice structure
+            node_info (dict): dictionary of the node information
+            edge_info (dict): dictionary of the edge information
+            freeze (bool): whether to copy the information into read-only mappings or refer to it as it is
+        """
+        if edge_info is None:
+            edge_info = {}
+        if freeze:
+            node_info = MappingProxyType({key: MappingProxyType(dict(val)) for key, val in node_info.items()})
+            edge_info = MappingProxyType({key: MappingProxyType(dict(val)) for key, val in edge_info.items()})
+        self.lattice = lattice
+        self.node_info = node_info
+        self.edge_info = edge_info
+
+    def replace(self, node_info=None, edge_info=None):
+        """make a new context sharing the lattice
+        Args:
+            node_info (dict): dictionary of the node information (unchanged if None)
+            edge_info (dict): dictionary of the edge information (unchanged if None)
+        Returns:
+            context (Context): new context
+        """
+        return Context(
+            self.lattice,
+            self.node_info if node_info is None else node_info,
+            self.edge_info if edge_info is None else edge_info,
+        )
+
+class TargetIndex:
+    """Index of the list of targets to look up the values once per node or pair"""
+
+    def __init__(self, targets):
+        """Initailize the Class
+        Args:
+            targets (list): list of the tuples of the target qubit labels
+        """
+        self.targets = targets
+        self.unique = {}
+
+    def __len__(self):
+        return len(self.targets)
+
+    def get(self, pos):
+        """get the unique labels at the position of the targets
+        Args:
+            pos (int or tuple): position of the node, or positions of the pair
+        Returns:
+            unique (list): list of the unique node or pair labels
+            inverse (np.ndarray): index of the unique label for each target
+        """
+        if pos not in self.unique:
+            if type(pos) is tuple:
+                labels = [(t[pos[0]], t[pos[1]]) for t in self.targets]
+            else:
+                labels = [t[pos] for t in self.targets]
+            index = {}
+            inverse = np.array([index.setdefault(x, len(index)) for x in labels], dtype=int)
+            self.unique.setdefault(pos, (list(index), inverse))
+        return self.unique[pos]
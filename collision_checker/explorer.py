@@ -0,0 +1,244 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.widgets import Slider
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+from .collision import VALUE_KEYS, get_condition_spec, make_condition_from_spec
+from .context import Lattice, Context
+from .check import get_safe_lattice_info
+from .lattice import qubit_lattice
+from .window import FREQUENCY_KEYS
+
+SLIDERS = {
+    "bound_dist_1" : (0, 1),
+    "bound_control_excite" : (0, 2),
+    "cnot_time" : (20, 500), # ns
+}
+
+class ThresholdExplorer:
+    """
+    Class of Threshold Explorer for the RQC square lattice
+
+        The values of the targets are looked up once and the margins are cached for each condition.
+        Changing a threshold evaluates the kernels again on the cached values, and changing the
+        frequency offset of a qubit evaluates only the targets containing the qubit. The figure
+        is drawn once and only the artists whose colors change are updated.
+    """
+
+    def __init__(self, condition, n, d, node_info, edge_info=None):
+        """Initailize the Class
+        Args:
+            condition (list): list of the collision conditions, whose copies are changed by the sliders
+            n (int): number of qubits
+            d (int): number of mux in a line
+            node_info (dict): dictionary of the node information
+            edge_info (dict): dictionary of the edge information
+        """
+        # the sliders change the copies, so that the given conditions keep their thresholds
+        self.condition = make_condition_from_spec(get_condition_spec(condition))
+        self.n = n
+        self.d = d
+        self.nodes, self.edges, self.pos = qubit_lattice(n, d)
+        self.nodes = list(self.nodes)
+        self.context = Context(Lattice(self.nodes, self.edges), node_info, edge_info)
+        self.offset = np.zeros(len(self.nodes))
+        self.targets = {}
+        self.index = {}
+        self.values = {}
+        self.position = {}
+        self.rows = {}
+        self.margins = {}
+        for col in self.condition:
+            index = col.get_index(context=self.context)
+            values = col.get_values(index, self.context)
+            if len(index):
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    col.kernel(values)
+            position = np.array([[self.context.lattice.index[x] for x in t] for t in index.targets], dtype=int).reshape(len(index), col.body)
+            self.targets[col] = index.targets
+            self.index[col] = index
+            self.values[col] = dict(values)
+            self.position[col] = position
+            self.rows[col] = [np.nonzero((position == idx).any(axis=1))[0] for idx in range(len(self.nodes))]
+            self.margins[col] = self.get_margins(col)
+        self.fig = None
+
+    def get_margins(self, col, rows=None):
+        """evaluate the margins on the cached values with the frequency offsets
+        Args:
+            col (FrequencyCollision): collision condition
+            rows (np.ndarray): indices of the targets (all the targets if None)
+        Returns:
+            margins (np.ndarray): margins of the collision in MHz
+        """
+        if rows is None:
+            rows = np.arange(len(self.targets[col]))
+        if len(rows) == 0:
+            return np.zeros(0)
+        values = {}
+        for name, val in self.values[col].items():
+            values[name] = val[rows]
+            if name in FREQUENCY_KEYS:
+                values[name] = values[name] + self.offset[self.position[col][rows, FREQUENCY_KEYS[name]]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.broadcast_to(col.kernel(values), (len(rows),)).copy()
+
+    def set_threshold(self, key, value):
+        """change the default value of all the conditions of the explorer and evaluate the margins again
+        The cached values falling back to the default (e.g. max_detuning or coupling) are looked up again.
+        The nnn_coupling is not derived again from the coupling, so set it separately if needed.
+        Args:
+            key (str): key of the default value, e.g. "bound_dist_1", "bound_control_excite" or "cnot_time"
+            value (float): new value
+        """
+        if key not in self.condition[0].default:
+            raise ValueError(f"unknown key of the default values: {key}")
+        keys = {key}
+        if key in ("coupling", "nnn_coupling"):
+            # the couplings are looked up from coupling or nnn_coupling depending on the distance
+            keys.add(None)
+        for col in self.condition:
+            col.default[key] = value
+            col.set_alias()
+            names = [name for name in self.values[col] if VALUE_KEYS[name][1] in keys]
+            if names:
+                values = col.get_values(self.index[col], self.context)
+                for name in names:
+                    self.values[col][name] = values[name]
+            self.margins[col] = self.get_margins(col)
+
+    def set_offset(self, q, value):
+        """change the frequency offset of the qubit and evaluate the margins of its targets again
+        Args:
+            q (int): node label
+            value (float): frequency offset in MHz
+        """
+        idx = self.context.lattice.index[q]
+        self.offset[idx] = value
+        for col in self.condition:
+            rows = self.rows[col][idx]
+            self.margins[col][rows] = self.get_margins(col, rows)
+
+    def get_collision_info(self):
+        """get the collisions from the cached margins
+        Returns:
+            collision_info (dict): dictionary of the collision information, same as get_collision_info but keyed by the conditions of the explorer
+        """
+        return {col: [self.targets[col][k] for k in np.nonzero(self.margins[col] < 0)[0]] for col in self.condition}
+
+    def show(self):
+        """draw the lattice with the sliders of the thresholds and the frequency offsets
+        Returns:
+            fig (matplotlib.figure.Figure): figure of the explorer
+        """
+        d = self.d
+        self.fig = plt.figure(figsize=(1.5*d, 1.5*d + 2))
+        self.ax = self.fig.add_axes([0.05, 0.3, 0.9, 0.65])
+        self.ax.set_axis_off()
+        xy = np.array([self.pos[i] for i in self.nodes])
+
+        # the lattice is drawn once as the background, and the overlays are the animated artists
+        # drawn over it by blitting, with an artist for each edge
+        self.lines = {}
+        for i, j in self.edges:
+            x, y = zip(self.pos[i], self.pos[j])
+            self.ax.plot(x, y, color=(0, 0, 0, 0.3), linestyle="--", linewidth=3, zorder=1)
+            self.lines[(i, j)] = self.ax.plot(x, y, color="b", linewidth=3, visible=False, animated=True)[0]
+        self.scatter = self.ax.scatter(xy[:, 0], xy[:, 1], s=500, c=["k"]*len(self.nodes), animated=True)
+        # the labels are drawn as the paths of a single artist, which is much faster than the texts
+        paths = []
+        for i in self.nodes:
+            path = TextPath((0, 0), str(i), size=15)
+            center = (path.vertices.min(axis=0) + path.vertices.max(axis=0))/2
+            paths.append(Path(path.vertices - center, path.codes))
+        self.labels = PathCollection(paths, offsets=xy, offset_transform=self.ax.transData, facecolor="w", animated=True)
+        self.labels.set_transform(Affine2D().scale(self.fig.dpi/72))
+        self.ax.add_collection(self.labels)
+        self.title = self.ax.text(0.5, 1, "", transform=self.ax.transAxes, fontsize=12, ha="center", va="top", animated=True)
+        self.colors = {}
+        self.node_colors = None
+        self.background = None
+
+        self.sliders = {}
+        for k, (key, (lower, upper)) in enumerate(SLIDERS.items()):
+            slider = Slider(self.fig.add_axes([0.35, 0.22 - 0.04*k, 0.45, 0.03]), key, lower, upper, valinit=self.condition[0].default[key])
+            slider.on_changed(lambda val, key=key: self.on_threshold(key, val))
+            self.sliders[key] = slider
+        self.sliders["qubit"] = Slider(self.fig.add_axes([0.35, 0.10, 0.45, 0.03]), "qubit", 0, len(self.nodes) - 1, valinit=0, valstep=1)
+        self.sliders["qubit"].on_changed(self.on_qubit)
+        self.sliders["offset"] = Slider(self.fig.add_axes([0.35, 0.06, 0.45, 0.03]), "offset (MHz)", -300, 300, valinit=0)
+        self.sliders["offset"].on_changed(self.on_offset)
+        for slider in self.sliders.values():
+            # the sliders are redrawn by the blitting instead of the whole figure
+            slider.drawon = False
+            slider.ax.set_animated(True)
+        self.selecting = False
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
+        self.update()
+        return self.fig
+
+    def on_draw(self, event):
+        """callback of the full redraw, which keeps the background for the blitting"""
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.blit()
+
+    def blit(self):
+        """draw the overlays over the background and the sliders"""
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.background)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        for artist in [self.scatter, self.labels, self.title]:
+            self.ax.draw_artist(artist)
+        for slider in self.sliders.values():
+            self.fig.draw_artist(slider.ax)
+        canvas.blit(self.fig.bbox)
+
+    def on_threshold(self, key, val):
+        """callback of the threshold sliders"""
+        self.set_threshold(key, val)
+        self.update()
+
+    def on_qubit(self, val):
+        """callback of the qubit slider, which shows the offset of the qubit"""
+        self.selecting = True
+        self.sliders["offset"].set_val(self.offset[int(val)])
+        self.selecting = False
+        self.blit()
+
+    def on_offset(self, val):
+        """callback of the offset slider"""
+        if not self.selecting:
+            self.set_offset(self.nodes[int(self.sliders["qubit"].val)], val)
+            self.update()
+
+    def update(self):
+        """update the changed artists from the cached margins"""
+        collision_info = self.get_collision_info()
+        safe_lattice = get_safe_lattice_info(self.nodes, self.edges, collision_info, self.context)
+        collided = {(t[0], t[1]) for targets in collision_info.values() for t in targets if len(t) >= 2}
+        for i, j in self.edges:
+            if ((i, j) in collided) or ((j, i) in collided):
+                color = "r"
+            elif safe_lattice.is_safe_edge((i, j)) and safe_lattice.is_safe_edge((j, i)):
+                color = "b"
+            elif safe_lattice.is_safe_edge((i, j)) or safe_lattice.is_safe_edge((j, i)):
+                color = "c"
+            else:
+                color = None
+            if self.colors.get((i, j)) != color:
+                self.colors[(i, j)] = color
+                self.lines[(i, j)].set_visible(color is not None)
+                if color is not None:
+                    self.lines[(i, j)].set_color(color)
+        node_colors = ["b" if safe_lattice.is_safe_node(i) else "r" for i in self.nodes]
+        if node_colors != self.node_colors:
+            self.node_colors = node_colors
+            self.scatter.set_facecolor(node_colors)
+        self.title.set_text(", ".join(f"{col.name}: {len(targets)}" for col, targets in collision_info.items() if targets))
+        self.blit()
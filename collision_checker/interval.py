@@ -0,0 +1,225 @@
+import numpy as np
+from .collision import ArrayValues, VALUE_KEYS
+from .context import TargetIndex
+
+class Interval:
+    """
+    Class of Interval arrays [lo, hi] for the collision kernels
+
+        The NumPy ufuncs used in the kernels are overloaded, so that the same formulas give the
+        bounds of the margins. The booleans are ordered as False < True, which means lo is
+        "definitely true" and hi is "possibly true". The rounding of the floats is not directed.
+    """
+
+    def __init__(self, lo, hi=None):
+        """Initailize the Class
+        Args:
+            lo (float or np.ndarray): lower bound
+            hi (float or np.ndarray): upper bound (same as lo if None)
+        """
+        self.lo = np.asarray(lo)
+        self.hi = self.lo if hi is None else np.asarray(hi)
+
+    def __repr__(self):
+        return f"Interval({self.lo!r}, {self.hi!r})"
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or kwargs or ufunc not in UFUNCS:
+            return NotImplemented
+        inputs = [x if type(x) is Interval else Interval(x) for x in inputs]
+        result = UFUNCS[ufunc](*inputs)
+        if result.lo.dtype.kind != "f":
+            return result
+        # nan from the infinite bounds (such as inf-inf) is unbounded, while nan of the values is kept
+        given = np.zeros((), dtype=bool)
+        for x in inputs:
+            if x.lo.dtype.kind == "f":
+                given = given | np.isnan(x.lo) | np.isnan(x.hi)
+        lo = np.where(np.isnan(result.lo) & ~given, -np.inf, result.lo)
+        hi = np.where(np.isnan(result.hi) & ~given, np.inf, result.hi)
+        return Interval(lo, hi)
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func is not np.where or kwargs or len(args) != 3:
+            return NotImplemented
+        cond, x, y = [a if type(a) is Interval else Interval(a) for a in args]
+        lo = np.where(cond.lo, x.lo, np.where(cond.hi, np.minimum(x.lo, y.lo), y.lo))
+        hi = np.where(cond.lo, x.hi, np.where(cond.hi, np.maximum(x.hi, y.hi), y.hi))
+        return Interval(lo, hi)
+
+    def __add__(self, other):
+        return np.add(self, other)
+
+    def __radd__(self, other):
+        return np.add(other, self)
+
+    def __sub__(self, other):
+        return np.subtract(self, other)
+
+    def __rsub__(self, other):
+        return np.subtract(other, self)
+
+    def __mul__(self, other):
+        return np.multiply(self, other)
+
+    def __rmul__(self, other):
+        return np.multiply(other, self)
+
+    def __truediv__(self, other):
+        return np.true_divide(self, other)
+
+    def __rtruediv__(self, other):
+        return np.true_divide(other, self)
+
+    def __pow__(self, other):
+        return np.power(self, other)
+
+    def __neg__(self):
+        return np.negative(self)
+
+    def __abs__(self):
+        return np.absolute(self)
+
+    def __lt__(self, other):
+        return np.less(self, other)
+
+    def __gt__(self, other):
+        return np.greater(self, other)
+
+    def __or__(self, other):
+        return np.bitwise_or(self, other)
+
+    def __ror__(self, other):
+        return np.bitwise_or(other, self)
+
+def _hull(*values):
+    """smallest interval containing the values (nan if any of them is nan)"""
+    return Interval(np.minimum.reduce(np.broadcast_arrays(*values)), np.maximum.reduce(np.broadcast_arrays(*values)))
+
+def _multiply(a, b):
+    # 0*inf is taken as 0, since the infinite bound is never reached
+    products = []
+    for x in [a.lo, a.hi]:
+        for y in [b.lo, b.hi]:
+            products.append(np.where(((x == 0) & ~np.isnan(y)) | ((y == 0) & ~np.isnan(x)), 0., x*y))
+    return _hull(*products)
+
+def _divide(a, b):
+    # the quotients are taken as they are for the point intervals to match the nominal values
+    zero = (b.lo <= 0) & (b.hi >= 0) & ~((b.lo == 0) & (b.hi == 0))
+    quotients = _hull(a.lo/b.lo, a.lo/b.hi, a.hi/b.lo, a.hi/b.hi)
+    return Interval(np.where(zero, -np.inf, quotients.lo), np.where(zero, np.inf, quotients.hi))
+
+def _absolute(a):
+    lo = np.where(a.lo >= 0, a.lo, np.where(a.hi <= 0, -a.hi, 0.))
+    lo = np.where(np.isnan(a.lo) | np.isnan(a.hi), np.nan, lo)
+    return Interval(lo, np.maximum(abs(a.lo), abs(a.hi)))
+
+def _power(a, b):
+    if not np.all(b.lo == b.hi) or not np.all(b.lo == np.round(b.lo)):
+        raise ValueError("the exponent of the interval must be an integer")
+    if np.all(b.lo % 2 == 0):
+        a = _absolute(a)
+    return Interval(a.lo**b.lo, a.hi**b.lo)
+
+def _isnan(a):
+    lo, hi = np.isnan(a.lo), np.isnan(a.hi)
+    return Interval(lo & hi, lo | hi)
+
+UFUNCS = {
+    np.add : lambda a, b: Interval(a.lo + b.lo, a.hi + b.hi),
+    np.subtract : lambda a, b: Interval(a.lo - b.hi, a.hi - b.lo),
+    np.multiply : _multiply,
+    np.true_divide : _divide,
+    np.negative : lambda a: Interval(-a.hi, -a.lo),
+    np.absolute : _absolute,
+    np.power : _power,
+    np.minimum : lambda a, b: Interval(np.minimum(a.lo, b.lo), np.minimum(a.hi, b.hi)),
+    np.maximum : lambda a, b: Interval(np.maximum(a.lo, b.lo), np.maximum(a.hi, b.hi)),
+    np.fmin : lambda a, b: Interval(np.fmin(a.lo, b.lo), np.fmin(a.hi, b.hi)),
+    np.fmax : lambda a, b: Interval(np.fmax(a.lo, b.lo), np.fmax(a.hi, b.hi)),
+    np.isnan : _isnan,
+    np.less : lambda a, b: Interval(a.hi < b.lo, a.lo < b.hi),
+    np.greater : lambda a, b: Interval(a.lo > b.hi, a.hi > b.lo),
+    np.bitwise_or : lambda a, b: Interval(a.lo | b.lo, a.hi | b.hi),
+    np.logical_or : lambda a, b: Interval(a.lo | b.lo, a.hi | b.hi),
+}
+
+class IntervalValues(ArrayValues):
+    """Dictionary of the interval arrays of the list of targets for the collision kernel"""
+
+    def __missing__(self, name):
+        unique, inverse = self.targets.get(VALUE_KEYS[name][0])
+        values = [self.lookup(name, label) for label in unique]
+        if not any(type(x) is Interval for x in values):
+            self[name] = np.array(values, dtype=float)[inverse]
+            return self[name]
+        lo = np.array([x.lo if type(x) is Interval else x for x in values], dtype=float)
+        hi = np.array([x.hi if type(x) is Interval else x for x in values], dtype=float)
+        self[name] = Interval(lo[inverse], hi[inverse])
+        return self[name]
+
+def get_interval_info(info, sigma):
+    """replace the values of the information by the intervals of value ± sigma
+    Args:
+        info (dict): dictionary of the node or edge information
+        sigma (dict): dictionary of the uncertainties for each key, e.g. {"frequency": 5, "anharmonicity": 2}
+    Returns:
+        info (dict): dictionary of the information with the intervals
+    """
+    interval_info = {}
+    for label, val in info.items():
+        interval_info[label] = dict(val)
+        for key, s in sigma.items():
+            if key in val:
+                interval_info[label][key] = Interval(val[key] - s, val[key] + s)
+    return interval_info
+
+def get_margin_bounds(col, targets, context=None):
+    """get the lower and upper bounds of the margins over the intervals of the values
+    Args:
+        col (FrequencyCollision): collision condition
+        targets (list or TargetIndex): list of the tuples of the target qubit labels
+        context (Context): lattice and calibration with the intervals (the ones set by set_graph and set_info if None)
+    Returns:
+        lo (np.ndarray): lower bounds of the margins in MHz (np.inf if not applicable)
+        hi (np.ndarray): upper bounds of the margins in MHz (np.inf if not applicable)
+    """
+    context = col.context if context is None else context
+    if type(targets) is TargetIndex:
+        index = targets
+        mask = np.ones(len(targets), dtype=bool)
+    else:
+        mask = np.array([col.applicable(*t, context=context) for t in targets], dtype=bool)
+        index = TargetIndex([t for t, m in zip(targets, mask) if m])
+    lo = np.full(len(targets), np.inf)
+    hi = np.full(len(targets), np.inf)
+    if len(index) == 0:
+        return lo, hi
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        margins = col.kernel(IntervalValues(col, context, index))
+    if type(margins) is not Interval:
+        margins = Interval(margins)
+    lo[mask] = np.broadcast_to(margins.lo, (len(index),))
+    hi[mask] = np.broadcast_to(margins.hi, (len(index),))
+    return lo, hi
+
+def evaluate_bounds(condition, context):
+    """check collisions under the uncertainties of the values in a single pass
+    Every applicable target is either definitely in collision (the upper bound of the margin
+    is negative), uncertain (only the lower bound is negative) or definitely safe.
+    Args:
+        condition (list): list of the collision conditions
+        context (Context): lattice and calibration with the intervals (see get_interval_info)
+    Returns:
+        collision_info (dict): dictionary of the targets definitely in collision
+        uncertain_info (dict): dictionary of the targets which may or may not be in collision
+    """
+    collision_info = {}
+    uncertain_info = {}
+    for col in condition:
+        index = col.get_index(context=context)
+        lo, hi = get_margin_bounds(col, index, context)
+        collision_info[col] = [index.targets[k] for k in np.nonzero(hi < 0)[0]]
+        uncertain_info[col] = [index.targets[k] for k in np.nonzero((lo < 0) & ~(hi < 0))[0]]
+    return collision_info, uncertain_info
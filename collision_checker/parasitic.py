@@ -0,0 +1,102 @@
+import itertools
+import numpy as np
+from .context import TargetIndex
+
+def get_neighbor_pairs(pos, cutoff):
+    """find the pairs of the nodes physically within the cutoff radius
+    The nodes are sorted into the grid cells of the size of the cutoff, so that only the nodes
+    in the adjacent cells are compared, which costs O(N log N) for the sorting.
+    Args:
+        pos (dict): dictionary of the positions of the nodes
+        cutoff (float): cutoff radius in the unit of the positions
+    Returns:
+        pairs (list): list of the node label pairs (i, j) with i before j in pos
+        r (np.ndarray): physical distance of each pair
+    """
+    labels = list(pos)
+    if not labels:
+        return [], np.zeros(0)
+    x = np.array([pos[i] for i in labels], dtype=float)
+    cell = np.floor((x - x.min(axis=0))/cutoff).astype(np.int64)
+    shape = cell.max(axis=0) + 3
+    # the cells are shifted by 1 so that the neighbor cells of the edge are in the grid
+    key = np.ravel_multi_index((cell + 1).T, shape)
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+
+    first, second = [], []
+    for offset in itertools.product([-1, 0, 1], repeat=x.shape[1]):
+        neighbor = np.ravel_multi_index((cell + 1 + np.array(offset)).T, shape)
+        start = np.searchsorted(sorted_key, neighbor, side="left")
+        stop = np.searchsorted(sorted_key, neighbor, side="right")
+        count = stop - start
+        a = np.repeat(np.arange(len(labels)), count)
+        b = order[np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count) + np.repeat(start, count)]
+        first.append(a[a < b])
+        second.append(b[a < b])
+    first, second = np.concatenate(first), np.concatenate(second)
+    r = np.linalg.norm(x[first] - x[second], axis=1)
+    keep = r <= cutoff
+    first, second, r = first[keep], second[keep], r[keep]
+    order = np.lexsort((second, first))
+    pairs = [(labels[a], labels[b]) for a, b in zip(first[order], second[order])]
+    return pairs, r[order]
+
+def parasitic_coupling(r, g0=1.0, r0=0.45, power=3):
+    """coupling decaying with the power of the physical distance
+    Args:
+        r (np.ndarray): physical distance
+        g0 (float): coupling at the distance r0 in MHz
+        r0 (float): reference distance (0.45 is the nearest spacing of the qubit_lattice positions)
+        power (float): power of the decay
+    Returns:
+        g (np.ndarray): coupling in MHz
+    """
+    return g0*(r0/r)**power
+
+def get_parasitic_pairs(lattice, pos, cutoff):
+    """find the pairs of the nodes which are physically close but beyond the distance 2 on the graph
+    The pairs within the distance 2 have the coupling or nnn_coupling already.
+    Args:
+        lattice (Lattice): lattice structure
+        pos (dict): dictionary of the positions of the nodes, e.g. the one of qubit_lattice
+        cutoff (float): cutoff radius in the unit of the positions
+    Returns:
+        pairs (list): list of the node label pairs in the both directions
+        r (np.ndarray): physical distance of each pair
+    """
+    pairs, r = get_neighbor_pairs({i: pos[i] for i in lattice.nodes}, cutoff)
+    keep = [k for k, (i, j) in enumerate(pairs) if lattice.distance(i, j) > 2]
+    pairs = [pairs[k] for k in keep]
+    r = r[keep]
+    return pairs + [(j, i) for i, j in pairs], np.concatenate([r, r])
+
+def evaluate_parasitic(condition, context, pos, cutoff, coupling=parasitic_coupling):
+    """check collisions of the pairs coupled by the parasitic coupling
+    The margins of the conditions coming only from the static coupling gij (Type1A and Type3A)
+    are evaluated for the pairs beyond the distance 2 on the graph with gij given by the physical
+    distance. The other conditions (CR drives and detuning limits) apply only to the coupled qubits.
+    Args:
+        condition (list): list of the collision conditions with static_coupling
+        context (Context): lattice and calibration
+        pos (dict): dictionary of the positions of the nodes, e.g. the one of qubit_lattice
+        cutoff (float): cutoff radius in the unit of the positions
+        coupling (function): coupling in MHz as a function of the physical distance
+    Returns:
+        collision_info (dict): dictionary of the collision information, same as get_collision_info
+    """
+    pairs, r = get_parasitic_pairs(context.lattice, pos, cutoff)
+    index = TargetIndex(pairs)
+    collision_info = {}
+    for col in condition:
+        if not col.static_coupling:
+            raise ValueError(f"{col.name} does not come from the static coupling and is not applicable to the parasitic pairs")
+        if len(index) == 0:
+            collision_info[col] = []
+            continue
+        values = col.get_values(index, context)
+        values["gij"] = coupling(r)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            margins = np.broadcast_to(col.kernel(values), (len(index),))
+        collision_info[col] = [pairs[k] for k in np.nonzero(margins < 0)[0]]
+    return collision_info
@@ -0,0 +1,142 @@
+import itertools
+import numpy as np
+from .context import Lattice, Context, TargetIndex
+from .lattice import qubit_lattice
+
+class PeriodicDesign:
+    """
+    Class of Periodic Design of the frequencies on the RQC square lattice
+
+        The frequencies are repeated with the period of p x q mux, so that the margins of the
+        translated targets are the same. Only the targets starting from one unit cell are checked
+        on a window lattice with the margin of 2 mux around the cell, which contains all the nodes
+        within the distance 2 from the targets. The targets at the boundary of the chip are the
+        translated ones whose nodes and distances remain in the chip, so they are found when the
+        collisions are expanded to the whole chip.
+        The qubits in the unit cell are labeled as 4*(a*q + b) + k for the mux (a, b) and the qubit k.
+    """
+
+    def __init__(self, d, period=(1, 1)):
+        """Initailize the Class
+        Args:
+            d (int): number of mux in a line of the chip
+            period (tuple): number of mux (p, q) of the unit cell in the vertical and horizontal directions
+        """
+        self.d = d
+        self.period = tuple(period)
+        p, q = self.period
+        w = max(p, q) + 4
+        nodes, edges, _ = qubit_lattice(4*w*w, w)
+        self.window = Lattice(nodes, edges)
+        self.width = w
+        self.cell = {}
+        self.anchors = []
+        for i in range(w):
+            for j in range(w):
+                for k in range(4):
+                    x = 4*(i*w + j) + k
+                    self.cell[x] = 4*(((i - 2) % p)*q + (j - 2) % q) + k
+                    if (2 <= i < 2 + p) and (2 <= j < 2 + q):
+                        self.anchors.append(x)
+        self.index = {}
+        self.chip = None
+
+    @property
+    def cell_nodes(self):
+        """list of the node labels in the unit cell"""
+        return list(range(4*self.period[0]*self.period[1]))
+
+    def get_index(self, col):
+        """get the cached index of the targets starting from the unit cell
+        Args:
+            col (FrequencyCollision): collision condition
+        Returns:
+            index (TargetIndex): index of the list of the targets on the window lattice
+        """
+        key = tuple(col.distances)
+        if key not in self.index:
+            targets = [t for i in self.anchors for t in self.window.candidates(col.distances, i)]
+            self.index.setdefault(key, TargetIndex(targets))
+        return self.index[key]
+
+    def get_context(self, pattern):
+        """make the context of the window lattice with the pattern
+        Args:
+            pattern (dict): dictionary of the node information for the unit cell
+        Returns:
+            context (Context): lattice and calibration of the window lattice
+        """
+        node_info = {x: pattern[c] for x, c in self.cell.items() if c in pattern}
+        return Context(self.window, node_info, freeze=False)
+
+    def get_node_info(self, pattern):
+        """repeat the pattern over the whole chip
+        Args:
+            pattern (dict): dictionary of the node information for the unit cell
+        Returns:
+            node_info (dict): dictionary of the node information for the chip
+        """
+        p, q = self.period
+        node_info = {}
+        for i in range(self.d):
+            for j in range(self.d):
+                for k in range(4):
+                    c = 4*((i % p)*q + j % q) + k
+                    if c in pattern:
+                        node_info[4*(i*self.d + j) + k] = pattern[c]
+        return node_info
+
+    def evaluate(self, condition, pattern):
+        """check the distinct collisions of the pattern
+        Args:
+            condition (list): list of the collision conditions
+            pattern (dict): dictionary of the node information for the unit cell
+        Returns:
+            collision_info (dict): dictionary of the targets in collision on the window lattice
+        """
+        context = self.get_context(pattern)
+        collision_info = {}
+        for col in condition:
+            index = self.get_index(col)
+            margins = col.margins(index, context)
+            collision_info[col] = [index.targets[k] for k in np.nonzero(margins < 0)[0]]
+        return collision_info
+
+    def to_cell(self, targets):
+        """convert the targets on the window lattice into the labels of the unit cell
+        Args:
+            targets (tuple): labels of the target qubits on the window lattice
+        Returns:
+            targets (tuple): labels of the target qubits in the unit cell
+        """
+        return tuple(self.cell[x] for x in targets)
+
+    def expand(self, collision_info):
+        """expand the distinct collisions to all the translated targets in the chip
+        Args:
+            collision_info (dict): dictionary of the targets in collision on the window lattice
+        Returns:
+            collision_info (dict): dictionary of the collision information for the chip, same as get_collision_info
+        """
+        if self.chip is None:
+            nodes, edges, _ = qubit_lattice(4*self.d**2, self.d)
+            self.chip = Lattice(nodes, edges)
+        p, q = self.period
+        w, d = self.width, self.d
+        chip_info = {}
+        for col, found in collision_info.items():
+            chip_info[col] = []
+            for targets in found:
+                mux = [divmod(x // 4, w) for x in targets]
+                pairs = list(itertools.combinations(range(len(targets)), 2))
+                distances = [self.window.distance(targets[a], targets[b]) for a, b in pairs]
+                for u in range(0, d, p):
+                    for v in range(0, d, q):
+                        shifted = [(i - 2 + u, j - 2 + v) for i, j in mux]
+                        if not all(0 <= i < d and 0 <= j < d for i, j in shifted):
+                            continue
+                        t = tuple(4*(i*d + j) + x % 4 for (i, j), x in zip(shifted, targets))
+                        if all(self.chip.distance(t[a], t[b]) == dist for (a, b), dist in zip(pairs, distances)):
+                            chip_info[col].append(t)
+            chip_info[col].sort()
+        return chip_info
@@ -0,0 +1,197 @@
+import heapq
+import numpy as np
+from .context import Lattice
+
+def group_by_node(nodes, gates, n):
+    """arrange the gates acting on each node into a padded array
+    Args:
+        nodes (np.ndarray): node index on which each gate acts
+        gates (np.ndarray): gate index
+        n (int): number of the nodes
+    Returns:
+        groups (np.ndarray): array of the gate indices for each node, padded with -1
+    """
+    order = np.argsort(nodes, kind="stable")
+    nodes, gates = nodes[order], gates[order]
+    count = np.bincount(nodes, minlength=n)
+    start = np.concatenate([[0], np.cumsum(count)[:-1]])
+    rank = np.arange(len(nodes)) - start[nodes]
+    groups = np.full((n, max(count.max(initial=0), 1)), -1, dtype=int)
+    groups[nodes, rank] = gates
+    return groups
+
+def get_conflict_pairs(gates, condition=(), context=None, guard=np.inf):
+    """list up the pairs of the CR gates which cannot be run at the same time
+    Two gates conflict when they share a qubit, or when they are related by the conditions:
+    a two-body condition such as Type1B relates the target qubits of the two gates, and
+    a three-body condition such as Type7, Type8 and Type9 relates a qubit of one gate as
+    a spectator of the other. A relation counts if the condition is applicable to the
+    qubits and its margin is smaller than the guard (every applicable relation by default).
+    Args:
+        gates (list): list of the directed edge labels (control, target), e.g. the safe edges
+        condition (list): list of the collision conditions defining the relations
+        context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        guard (float): margin in MHz under which the relation makes the gates conflict
+    Returns:
+        src (np.ndarray): gate indices of the pairs, sorted
+        dst (np.ndarray): gate indices of the pairs, so that both (a, b) and (b, a) are listed
+    """
+    gates = list(gates)
+    g = len(gates)
+    if context is None and condition:
+        context = condition[0].context
+        if context is None:
+            raise ValueError("the conditions need the lattice: give the context or call set_info and set_graph")
+    if context is None:
+        # the shared qubits do not need the lattice
+        lattice = Lattice(sorted({i for e in gates for i in e}), [])
+    else:
+        lattice = context.lattice
+    n = len(lattice.nodes)
+    gate = np.arange(g)
+    control = np.array([lattice.index[i] for i, _ in gates], dtype=int)
+    target = np.array([lattice.index[j] for _, j in gates], dtype=int)
+    on_qubit = group_by_node(np.concatenate([control, target]), np.concatenate([gate, gate]), n)
+    on_target = group_by_node(target, gate, n)
+
+    src = [np.repeat(gate, 2*on_qubit.shape[1])]
+    dst = [np.concatenate([on_qubit[control], on_qubit[target]], axis=1).ravel()]
+    for col in condition:
+        if col.body == 2:
+            # the targets of the two gates
+            shells = [lattice.get_shell_array(d)[target] for d in sorted({dist[0] for dist in col.distances})]
+            idx = np.concatenate([np.repeat(gate, s.shape[1]) for s in shells])
+            k = np.concatenate([s.ravel() for s in shells])
+            valid = k >= 0
+            targets = [target[idx], k]
+            groups = on_target
+        elif col.body == 3:
+            # the spectators of the gate
+            distance = np.array([lattice.distance(i, j) for i, j in gates])
+            shells = [lattice.get_shell_array(dist[1])[control[distance == dist[0]]] for dist in col.distances]
+            idx = np.concatenate([np.repeat(gate[distance == dist[0]], s.shape[1]) for dist, s in zip(col.distances, shells)])
+            k = np.concatenate([s.ravel() for s in shells])
+            valid = (k >= 0) & (k != target[idx])
+            targets = [control[idx], target[idx], k]
+            groups = on_qubit
+        else:
+            raise ValueError(f"{col.name} does not relate two gates")
+        if not np.isinf(guard) and valid.any():
+            labels = list(zip(*[[lattice.nodes[x] for x in t[valid]] for t in targets]))
+            close = np.zeros(len(valid), dtype=bool)
+            close[valid] = col.margins(labels, context) < guard
+            valid = close
+        idx, k = idx[valid], k[valid]
+        src.append(np.repeat(idx, groups.shape[1]))
+        dst.append(groups[k].ravel())
+
+    # the relations are made symmetric and the gates do not conflict with themselves
+    src, dst = np.concatenate(src), np.concatenate(dst)
+    valid = (dst >= 0) & (src != dst)
+    src, dst = src[valid], dst[valid]
+    pairs = np.sort(np.concatenate([src*g + dst, dst*g + src]))
+    pairs = pairs[np.diff(pairs, prepend=-1) != 0]
+    return pairs // g, pairs % g
+
+def to_bitsets(src, dst, g):
+    """pack the pairs into the bitsets
+    Args:
+        src (np.ndarray): gate indices of the pairs
+        dst (np.ndarray): gate indices of the pairs
+        g (int): number of the gates
+    Returns:
+        bitsets (list): list of the bitsets of dst for each gate in src
+    """
+    packed = np.zeros((g, (g + 7) // 8), dtype=np.uint8)
+    np.bitwise_or.at(packed, (src, dst >> 3), np.left_shift(1, dst & 7).astype(np.uint8))
+    return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+def get_conflict_graph(gates, condition=(), context=None, guard=np.inf):
+    """build the conflict graph of the CR gates which cannot be run at the same time
+    Args:
+        gates (list): list of the directed edge labels (control, target), e.g. the safe edges
+        condition (list): list of the collision conditions defining the relations
+        context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        guard (float): margin in MHz under which the relation makes the gates conflict
+    Returns:
+        conflict (list): list of the bitsets of the conflicting gates for each gate
+    """
+    gates = list(gates)
+    src, dst = get_conflict_pairs(gates, condition, context, guard)
+    return to_bitsets(src, dst, len(gates))
+
+def color_conflict_graph(conflict, method="greedy"):
+    """color the conflict graph so that the conflicting gates have the different colors
+    The greedy coloring gives each gate the first color not used by the preceding gates in
+    the list, which is done by taking the independent sets color by color on the bitsets.
+    Args:
+        conflict (list): list of the bitsets of the conflicting gates for each gate
+        method (str): "greedy" (first fit in the order of the gates) or "dsatur" (saturation degree first)
+    Returns:
+        colors (list): list of the colors for each gate
+    """
+    n = len(conflict)
+    colors = [None]*n
+    if method == "greedy":
+        uncolored = (1 << n) - 1
+        color = 0
+        while uncolored:
+            available = uncolored
+            while available:
+                low = available & -available
+                idx = low.bit_length() - 1
+                colors[idx] = color
+                uncolored ^= low
+                available &= ~(conflict[idx] | low)
+            color += 1
+        return colors
+    if method != "dsatur":
+        raise ValueError(f"unknown method: {method}")
+
+    # the colors of the neighbors are kept as bitsets and the heap is updated lazily
+    neighbors = []
+    for c in conflict:
+        buffer = np.frombuffer(c.to_bytes((c.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+        neighbors.append(np.flatnonzero(np.unpackbits(buffer, bitorder="little")).tolist())
+    degree = [len(x) for x in neighbors]
+    used = [0]*n
+    saturation = [0]*n
+    heap = [(0, -degree[idx], idx) for idx in range(n)]
+    heapq.heapify(heap)
+    while heap:
+        sat, _, idx = heapq.heappop(heap)
+        if colors[idx] is not None or -sat != saturation[idx]:
+            continue
+        color = (~used[idx] & (used[idx] + 1)).bit_length() - 1
+        colors[idx] = color
+        bit = 1 << color
+        for jdx in neighbors[idx]:
+            if colors[jdx] is None and not used[jdx] & bit:
+                used[jdx] |= bit
+                saturation[jdx] += 1
+                heapq.heappush(heap, (-saturation[jdx], -degree[jdx], jdx))
+    return colors
+
+def get_gate_layers(gates, condition=(), context=None, guard=np.inf, method="greedy"):
+    """schedule the CR gates into the layers of the gates which can be run at the same time
+    The gates are colored in the descending order of the number of the conflicts.
+    Args:
+        gates (list): list of the directed edge labels (control, target), e.g. the safe edges
+        condition (list): list of the collision conditions defining the relations, e.g. [Type1B(), Type7(), Type8(), Type9()]
+        context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+        guard (float): margin in MHz under which the relation makes the gates conflict
+        method (str): "greedy" (largest degree first) or "dsatur" (saturation degree first)
+    Returns:
+        layers (list): list of the lists of the gates in each layer
+    """
+    gates = list(gates)
+    g = len(gates)
+    src, dst = get_conflict_pairs(gates, condition, context, guard)
+    order = np.argsort(-np.bincount(src, minlength=g), kind="stable")
+    rank = np.empty(g, dtype=int)
+    rank[order] = np.arange(g)
+    colors = color_conflict_graph(to_bitsets(rank[src], rank[dst], g), method)
+    layers = [[] for _ in range(max(colors, default=-1) + 1)]
+    for gate, r in zip(gates, rank):
+        layers[colors[r]].append(gate)
+    return layers
@@ -0,0 +1,213 @@
+import json
+import numpy as np
+from . import collision
+from .collision import VALUE_KEYS
+from .context import Lattice, Context
+from .check import get_safe_lattice_info
+
+MAGIC = b"CCSNAP\x00\x00"
+VERSION = 1
+ALIGN = 64
+
+def save_checker(path, condition, context):
+    """save the prepared checker into a snapshot file
+    The snapshot holds the lattice and its shells, the targets of each condition, the values
+    looked up for the kernels and the defaults of the conditions, so that the collisions can be
+    checked again without networkx nor the calibration objects. The node labels must be integers.
+    The file consists of the magic, the version, the length of the JSON header, the header and
+    the arrays aligned to 64 bytes, whose dtypes, shapes and offsets are listed in the header.
+    Args:
+        path (str): path of the snapshot file
+        condition (list): list of the collision conditions
+        context (Context): lattice and calibration
+    """
+    lattice = context.lattice
+    arrays = {
+        "nodes": np.array(lattice.nodes, dtype=np.int64),
+        "edges": np.array(lattice.edges, dtype=np.int64).reshape(-1, 2),
+    }
+    for d in [1, 2]:
+        shells = [lattice.shells[i][d] for i in lattice.nodes]
+        arrays[f"shell{d}/indptr"] = np.cumsum([0] + [len(s) for s in shells]).astype(np.int64)
+        arrays[f"shell{d}/indices"] = np.array([j for s in shells for j in s], dtype=np.int64)
+
+    conditions = []
+    for k, col in enumerate(condition):
+        index = col.get_index(context=context)
+        values = col.get_values(index, context)
+        if len(index):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                col.kernel(values)
+        targets = np.array(index.targets, dtype=np.int64).reshape(len(index), col.body)
+        arrays[f"{k}/targets"] = targets
+        # the rows of the targets containing each node for the queries of the node
+        position = np.array([lattice.index[i] for i in targets.ravel().tolist()], dtype=np.int64)
+        order = np.argsort(position, kind="stable")
+        arrays[f"{k}/rows/indptr"] = np.concatenate([[0], np.cumsum(np.bincount(position, minlength=len(lattice.nodes)))]).astype(np.int64)
+        arrays[f"{k}/rows/indices"] = (order // col.body).astype(np.int32)
+        for name in values:
+            unique, inverse = index.get(VALUE_KEYS[name][0])
+            arrays[f"{k}/{name}/values"] = np.array([values.lookup(name, label) for label in unique], dtype=float)
+            arrays[f"{k}/{name}/inverse"] = inverse.astype(np.int32)
+        conditions.append({
+            "class": type(col).__name__,
+            "default": col.default,
+            "safe_mode": getattr(col, "safe_mode", None),
+            "names": list(values),
+        })
+
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"conditions": conditions, "arrays": table}).encode()
+    start = -(-(len(MAGIC) + 12 + len(header)) // ALIGN) * ALIGN
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.array([VERSION], dtype="<u4").tobytes())
+        f.write(np.array([len(header)], dtype="<u8").tobytes())
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(start + table[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+
+class PreparedChecker:
+    """
+    Class of Prepared Checker loaded from a snapshot file
+
+        The arrays are memory-mapped from the file and the kernels are evaluated on them directly,
+        so that neither the lattice nor the values are rebuilt. The lattice is restored from the
+        saved shells only when it is needed for the removals of the collisions.
+    """
+
+    def __init__(self, path):
+        """Initailize the Class
+        Args:
+            path (str): path of the snapshot file
+        """
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a snapshot of the collision checker")
+        version = int(data[len(MAGIC):len(MAGIC)+4].view("<u4")[0])
+        if version != VERSION:
+            raise ValueError(f"version {version} of the snapshot is not supported (expected {VERSION})")
+        length = int(data[len(MAGIC)+4:len(MAGIC)+12].view("<u8")[0])
+        header = json.loads(bytes(data[len(MAGIC)+12:len(MAGIC)+12+length]))
+        start = -(-(len(MAGIC) + 12 + length) // ALIGN) * ALIGN
+
+        self.arrays = {}
+        for name, val in header["arrays"].items():
+            dtype = np.dtype(val["dtype"])
+            count = int(np.prod(val["shape"]))
+            offset = start + val["offset"]
+            self.arrays[name] = data[offset:offset + count*dtype.itemsize].view(dtype).reshape(val["shape"])
+
+        self.index = {i: idx for idx, i in enumerate(self.arrays["nodes"].tolist())}
+        self.condition = []
+        self.names = {}
+        self.targets = {}
+        self.rows = {}
+        for k, val in enumerate(header["conditions"]):
+            kwargs = {"default": val["default"]}
+            if val["safe_mode"] is not None:
+                kwargs["safe_mode"] = val["safe_mode"]
+            col = getattr(collision, val["class"])(**kwargs)
+            self.condition.append(col)
+            self.names[col] = [(name, f"{k}/{name}") for name in val["names"]]
+            self.targets[col] = self.arrays[f"{k}/targets"]
+            self.rows[col] = (self.arrays[f"{k}/rows/indptr"], self.arrays[f"{k}/rows/indices"])
+        self.lattice = None
+
+    @property
+    def nodes(self):
+        """list of the node labels"""
+        return self.arrays["nodes"].tolist()
+
+    @property
+    def edges(self):
+        """list of the edge labels"""
+        return [tuple(e) for e in self.arrays["edges"].tolist()]
+
+    def get_lattice(self):
+        """restore the lattice from the saved shells
+        Returns:
+            lattice (Lattice): lattice structure
+        """
+        if self.lattice is None:
+            nodes = self.nodes
+            shells = {i: {} for i in nodes}
+            for d in [1, 2]:
+                indptr = self.arrays[f"shell{d}/indptr"].tolist()
+                indices = self.arrays[f"shell{d}/indices"].tolist()
+                for idx, i in enumerate(nodes):
+                    shells[i][d] = tuple(indices[indptr[idx]:indptr[idx+1]])
+            self.lattice = Lattice(nodes, self.edges, shells)
+        return self.lattice
+
+    def get_values(self, col, rows=None):
+        """get the values of the targets for the collision kernel
+        Args:
+            col (FrequencyCollision): collision condition of the snapshot
+            rows (np.ndarray): indices of the targets (all the targets if None)
+        Returns:
+            values (dict): dictionary of the value arrays
+        """
+        values = {}
+        for name, key in self.names[col]:
+            inverse = self.arrays[f"{key}/inverse"]
+            values[name] = self.arrays[f"{key}/values"][inverse if rows is None else inverse[rows]]
+        return values
+
+    def margins(self, col, rows=None):
+        """get the margins of the targets
+        Args:
+            col (FrequencyCollision): collision condition of the snapshot
+            rows (np.ndarray): indices of the targets (all the targets if None)
+        Returns:
+            margins (np.ndarray): margins of the collision in MHz
+        """
+        n = len(self.targets[col]) if rows is None else len(rows)
+        if n == 0:
+            return np.zeros(0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.broadcast_to(col.kernel(self.get_values(col, rows)), (n,))
+
+    def evaluate(self, q=None):
+        """check collisions of the snapshot
+        Args:
+            q (int): node label contained in the targets (all the targets if None)
+        Returns:
+            collision_info (dict): dictionary of the collision information, same as get_collision_info
+        """
+        collision_info = {}
+        for col in self.condition:
+            targets = self.targets[col]
+            rows = None
+            if q is not None:
+                indptr, indices = self.rows[col]
+                rows = indices[indptr[self.index[q]]:indptr[self.index[q]+1]]
+            found = self.margins(col, rows) < 0
+            selected = targets[found] if rows is None else targets[rows[found]]
+            collision_info[col] = [tuple(t) for t in selected.tolist()]
+        return collision_info
+
+    def get_safe_lattice_info(self, collision_info):
+        """get the safe lattice of the collisions
+        Args:
+            collision_info (dict): dictionary of the collision information given by evaluate
+        Returns:
+            safe_lattice (SafeLattice): safe lattice with its connectivity
+        """
+        context = Context(self.get_lattice(), {}, freeze=False)
+        return get_safe_lattice_info(self.nodes, self.edges, collision_info, context)
+
+def load_checker(path):
+    """load the prepared checker from a snapshot file
+    Args:
+        path (str): path of the snapshot file
+    Returns:
+        checker (PreparedChecker): prepared checker
+    """
+    return PreparedChecker(path)
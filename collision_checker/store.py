@@ -0,0 +1,232 @@
+import os
+import re
+import json
+import numpy as np
+
+VERSION = 1
+
+def _label(x):
+    """restore the tuple label from the list of JSON"""
+    return tuple(_label(i) for i in x) if type(x) is list else x
+
+def create_store(path, nodes, edges, condition, chunk=1024):
+    """create the result store of the sweep or the Monte Carlo run, or open it to resume the run
+    Args:
+        path (str): path of the directory of the store
+        nodes (list): list of the node labels
+        edges (list): list of the edge labels (the both directions are stored as in SafeLattice)
+        condition (list): list of the collision conditions
+        chunk (int): number of the samples in a chunk
+    Returns:
+        store (ResultStore): result store
+    """
+    directed = []
+    for e in edges:
+        directed += [list(e), [e[1], e[0]]]
+    meta = {
+        "version": VERSION,
+        "nodes": list(nodes),
+        "edges": directed,
+        "condition": [col.name for col in condition],
+        "chunk": chunk,
+    }
+    os.makedirs(path, exist_ok=True)
+    file = os.path.join(path, "meta.json")
+    if os.path.exists(file):
+        with open(file) as f:
+            # the tuples of the labels are compared as the lists of JSON
+            if json.load(f) != json.loads(json.dumps(meta)):
+                raise ValueError(f"{path} is a store of the different lattice or conditions")
+    else:
+        with open(file + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(file + ".tmp", file)
+    return ResultStore(path)
+
+class ResultStore:
+    """
+    Class of Result Store of the sweep or the Monte Carlo run
+
+        Each sample is stored as the bit-packed masks of the safe nodes and edges, and the number
+        of the collisions of each condition. The samples are appended chunk by chunk to the .npy
+        files, which are written to temporary files and renamed when they are complete, so that a
+        crashed run leaves only the complete chunks. Every writer (e.g. each worker process) has
+        its own chunk files, and the chunks are read memory-mapped one by one by the queries.
+    """
+
+    def __init__(self, path):
+        """Initailize the Class
+        Args:
+            path (str): path of the directory of the store made by create_store
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != VERSION:
+            raise ValueError(f"version {meta['version']} of the store is not supported (expected {VERSION})")
+        self.path = path
+        self.nodes = [_label(i) for i in meta["nodes"]]
+        self.edges = [_label(e) for e in meta["edges"]]
+        self.condition = meta["condition"]
+        self.chunk = meta["chunk"]
+        self.node_index = {i: idx for idx, i in enumerate(self.nodes)}
+        self.edge_index = {e: idx for idx, e in enumerate(self.edges)}
+        self.dtype = np.dtype([
+            ("sample", np.int64),
+            ("nodes", np.uint8, ((len(self.nodes) + 7) // 8,)),
+            ("edges", np.uint8, ((len(self.edges) + 7) // 8,)),
+            ("counts", np.int32, (len(self.condition),)),
+        ])
+
+    def chunk_files(self, writer=None):
+        """list up the complete chunk files
+        Args:
+            writer (str): name of the writer (all the writers if None)
+        Returns:
+            files (list): list of the file names sorted by the writer and the chunk number
+        """
+        pattern = re.compile(r"chunk-(.+)-(\d+)\.npy")
+        files = []
+        for name in os.listdir(self.path):
+            match = pattern.fullmatch(name)
+            if match and (writer is None or match.group(1) == str(writer)):
+                files.append((match.group(1), int(match.group(2)), name))
+        return [name for _, _, name in sorted(files)]
+
+    def iter_chunks(self):
+        """iterate the complete chunks memory-mapped
+        Yields:
+            records (np.ndarray): structured array of the samples in the chunk
+        """
+        for name in self.chunk_files():
+            yield np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    def writer(self, name=0):
+        """open a writer appending the samples after its complete chunks
+        Args:
+            name (str): name of the writer, which must be unique among the parallel writers
+        Returns:
+            writer (ResultWriter): writer of the samples
+        """
+        return ResultWriter(self, name)
+
+    def __len__(self):
+        return sum(len(records) for records in self.iter_chunks())
+
+    def sample_ids(self):
+        """sample ids in the complete chunks, which can be skipped when the run is resumed
+        Returns:
+            samples (np.ndarray): sorted array of the sample ids
+        """
+        samples = [np.array(records["sample"]) for records in self.iter_chunks()]
+        return np.sort(np.concatenate(samples)) if samples else np.zeros(0, dtype=np.int64)
+
+    def unpack(self, records, key):
+        """unpack the masks of the samples
+        Args:
+            records (np.ndarray): structured array of the samples
+            key (str): "nodes" or "edges"
+        Returns:
+            mask (np.ndarray): boolean array of the shape (samples, nodes or edges), True if safe
+        """
+        count = len(self.nodes) if key == "nodes" else len(self.edges)
+        return np.unpackbits(records[key], axis=1, count=count, bitorder="little").astype(bool)
+
+    def get_failure_probability(self, key="edges"):
+        """probability that each node or edge is removed from the safe lattice
+        Args:
+            key (str): "nodes" or "edges"
+        Returns:
+            probability (dict): dictionary of the probability for each node or edge label
+        """
+        labels = self.nodes if key == "nodes" else self.edges
+        safe = np.zeros(len(labels), dtype=np.int64)
+        total = 0
+        for records in self.iter_chunks():
+            safe += self.unpack(records, key).sum(axis=0)
+            total += len(records)
+        probability = 1 - safe/total if total else np.full(len(labels), np.nan)
+        return dict(zip(labels, probability.tolist()))
+
+    def get_hit_counts(self):
+        """statistics of the collisions of each condition
+        Returns:
+            counts (dict): dictionary of the total number of the collisions for each condition
+            rate (dict): dictionary of the fraction of the samples with any collision for each condition
+        """
+        counts = np.zeros(len(self.condition), dtype=np.int64)
+        hits = np.zeros(len(self.condition), dtype=np.int64)
+        total = 0
+        for records in self.iter_chunks():
+            counts += records["counts"].sum(axis=0)
+            hits += (records["counts"] > 0).sum(axis=0)
+            total += len(records)
+        rate = hits/total if total else np.full(len(self.condition), np.nan)
+        return dict(zip(self.condition, counts.tolist())), dict(zip(self.condition, rate.tolist()))
+
+class ResultWriter:
+    """Class of Result Writer appending the samples to the store chunk by chunk"""
+
+    def __init__(self, store, name=0):
+        """Initailize the Class
+        Args:
+            store (ResultStore): result store
+            name (str): name of the writer, which must be unique among the parallel writers
+        """
+        if not re.fullmatch(r"[\w.]+", str(name)):
+            raise ValueError(f"invalid name of the writer: {name}")
+        self.store = store
+        self.name = str(name)
+        files = store.chunk_files(self.name)
+        self.number = int(files[-1].rsplit("-", 1)[1][:-4]) + 1 if files else 0
+        self.buffer = np.zeros(store.chunk, dtype=store.dtype)
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(self, sample, collision_info, safe_nodes, safe_edges):
+        """append the result of a sample
+        Args:
+            sample (int): sample id
+            collision_info (dict): dictionary of the collision information
+            safe_nodes (list): list of the safe node labels
+            safe_edges (list): list of the safe edge labels
+        """
+        store = self.store
+        nodes = np.zeros(len(store.nodes), dtype=bool)
+        nodes[[store.node_index[i] for i in safe_nodes]] = True
+        edges = np.zeros(len(store.edges), dtype=bool)
+        edges[[store.edge_index[tuple(e)] for e in safe_edges]] = True
+        counts = dict.fromkeys(store.condition, 0)
+        for col, targets in collision_info.items():
+            counts[col.name] += len(targets)
+
+        record = self.buffer[self.size]
+        record["sample"] = sample
+        record["nodes"] = np.packbits(nodes, bitorder="little")
+        record["edges"] = np.packbits(edges, bitorder="little")
+        record["counts"] = [counts[name] for name in store.condition]
+        self.size += 1
+        if self.size == store.chunk:
+            self.flush()
+
+    def flush(self):
+        """write the buffered samples as a complete chunk"""
+        if self.size == 0:
+            return
+        name = f"chunk-{self.name}-{self.number:06d}.npy"
+        file = os.path.join(self.store.path, name)
+        with open(file + ".tmp", "wb") as f:
+            np.save(f, self.buffer[:self.size])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(file + ".tmp", file)
+        self.number += 1
+        self.size = 0
+
+    def close(self):
+        """write the remaining samples"""
+        self.flush()
@@ -0,0 +1,162 @@
+import multiprocessing
+from .check import iter_collision_info
+from .collision import get_condition_spec, make_condition_from_spec
+from .lattice import qubit_lattice
+
+def get_tiles(d, tile):
+    """split the RQC square lattice into the mux-aligned tiles
+    Args:
+        d (int): number of mux in a line
+        tile (int): number of mux in a line of a tile
+    Returns:
+        tiles (list): list of the lists of the node labels owned by each tile
+    """
+    tiles = []
+    for ti in range(0, d, tile):
+        for tj in range(0, d, tile):
+            owned = []
+            for i in range(ti, min(ti+tile, d)):
+                for j in range(tj, min(tj+tile, d)):
+                    owned += [4*(i*d + j) + k for k in range(4)]
+            tiles.append(owned)
+    return tiles
+
+def get_halo(adjacency, owned, radius=2):
+    """find the nodes within the radius from the owned nodes
+    Args:
+        adjacency (dict): dictionary of the sets of the neighbor node labels
+        owned (list): list of the node labels owned by the tile
+        radius (int): radius of the halo
+    Returns:
+        halo (set): set of the node labels in the halo, excluding the owned nodes
+    """
+    owned = set(owned)
+    front = set(owned)
+    halo = set()
+    for _ in range(radius):
+        front = {j for i in front for j in adjacency[i]} - owned - halo
+        halo |= front
+    return halo
+
+def iter_subproblems(nodes, edges, node_info, edge_info, tiles, radius=2):
+    """generate the sub-lattices of the tiles with their halos
+    No condition looks beyond the distance 2, so the distances from the owned nodes up to 2 are
+    the same on the sub-lattice as on the whole lattice.
+    Args:
+        nodes (list): list of the node labels
+        edges (list): list of the edge labels
+        node_info (dict): dictionary of the node information
+        edge_info (dict): dictionary of the edge information
+        tiles (list): list of the lists of the node labels owned by each tile
+        radius (int): radius of the halo
+    Yields:
+        sub_nodes (list): list of the node labels in the tile and the halo
+        sub_edges (list): list of the edge labels between them
+        sub_node_info (dict): node information of the sub-lattice
+        sub_edge_info (dict): edge information of the sub-lattice
+        owned (list): list of the node labels owned by the tile
+    """
+    adjacency = {i: set() for i in nodes}
+    incident = {i: [] for i in nodes}
+    for idx, (i, j) in enumerate(edges):
+        adjacency[i].add(j)
+        adjacency[j].add(i)
+        incident[i].append(idx)
+    incident_info = {i: [] for i in nodes}
+    for e in edge_info:
+        incident_info.setdefault(e[0], []).append(e)
+
+    index = {node: idx for idx, node in enumerate(nodes)}
+    for owned in tiles:
+        members = set(owned) | get_halo(adjacency, owned, radius)
+        sub_nodes = sorted(members, key=index.__getitem__)
+        sub_edges = [edges[idx] for idx in sorted(idx for i in sub_nodes for idx in incident[i]) if edges[idx][1] in members]
+        sub_node_info = {i: node_info[i] for i in sub_nodes if i in node_info}
+        sub_edge_info = {e: edge_info[e] for i in sub_nodes for e in incident_info[i] if e[1] in members}
+        yield sub_nodes, sub_edges, sub_node_info, sub_edge_info, owned
+
+def check_tile(condition, sub_nodes, sub_edges, sub_node_info, sub_edge_info, owned):
+    """check collisions starting from the owned nodes of a tile
+    Args:
+        condition (list): list of the collision conditions
+        sub_nodes (list): list of the node labels in the tile and the halo
+        sub_edges (list): list of the edge labels between them
+        sub_node_info (dict): node information of the sub-lattice
+        sub_edge_info (dict): edge information of the sub-lattice
+        owned (list): list of the node labels owned by the tile
+    Returns:
+        found (list): list of the lists of the targets in collision for each condition
+    """
+    found = [[] for _ in condition]
+    index = {col: idx for idx, col in enumerate(condition)}
+    for col, i in iter_collision_info(condition, sub_nodes, sub_edges, sub_node_info, sub_edge_info, owned):
+        found[index[col]].append(i)
+    return found
+
+_worker = {}
+
+def _init_worker(spec):
+    """set up the collision conditions in the worker process"""
+    _worker["condition"] = make_condition_from_spec(spec)
+
+def _check_tile(sub):
+    """check collisions of a tile in the worker process"""
+    return check_tile(_worker["condition"], *sub)
+
+def iter_collision_info_tiled(condition, n, d, node_info, edge_info={}, tile=2, processes=None):
+    """check collisions tile by tile and yield them as each tile is finished
+    Every target is checked only in the tile owning its first qubit, so that the targets
+    in the halos are not duplicated. The tiles are checked by the fresh copies of the conditions,
+    so that the given conditions are not set to any lattice and the whole lattice is never built.
+    Pass a Context of the whole lattice to get_safe_lattice for the removals.
+    Args:
+        condition (list): list of the collision conditions
+        n (int): number of qubits
+        d (int): number of mux in a line
+        node_info (dict): dictionary of the node information
+        edge_info (dict): dictionary of the edge information
+        tile (int): number of mux in a line of a tile
+        processes (int): number of the worker processes (sequential if None)
+    Yields:
+        col (FrequencyCollision): collision condition
+        targets (tuple): labels of the target qubits in collision
+    """
+    nodes, edges, _ = qubit_lattice(n, d)
+    nodes = list(nodes)
+    subproblems = iter_subproblems(nodes, edges, node_info, edge_info, get_tiles(d, tile))
+    spec = get_condition_spec(condition)
+    if processes is None:
+        fresh = make_condition_from_spec(spec)
+        results = (check_tile(fresh, *sub) for sub in subproblems)
+        for found in results:
+            for col, targets in zip(condition, found):
+                for i in targets:
+                    yield col, i
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(spec,)) as pool:
+            for found in pool.imap(_check_tile, subproblems):
+                for col, targets in zip(condition, found):
+                    for i in targets:
+                        yield col, i
+
+def get_collision_info_tiled(condition, n, d, node_info, edge_info={}, tile=2, processes=None):
+    """check collisions by splitting the RQC square lattice into the mux-aligned tiles with the halo of radius 2
+    The given conditions are not set to the lattice, so pass a Context of the whole lattice to
+    get_safe_lattice, e.g. get_safe_lattice(nodes, edges, collision_info, Context(Lattice(nodes, edges), node_info)).
+    Args:
+        condition (list): list of the collision conditions
+        n (int): number of qubits
+        d (int): number of mux in a line
+        node_info (dict): dictionary of the node information
+        edge_info (dict): dictionary of the edge information
+        tile (int): number of mux in a line of a tile
+        processes (int): number of the worker processes (sequential if None)
+    Returns:
+        collision_info (dict): dictionary of the collision information, same as get_collision_info
+    """
+    collision_info = {col: [] for col in condition}
+    for col, i in iter_collision_info_tiled(condition, n, d, node_info, edge_info, tile, processes):
+        collision_info[col].append(i)
+    for col in condition:
+        collision_info[col].sort()
+    return collision_info
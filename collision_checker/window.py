@@ -0,0 +1,215 @@
+import numpy as np
+from .context import TargetIndex
+
+FREQUENCY_KEYS = {"wi": 0, "wj": 1, "wk": 2}
+
+class SubstitutedValues(dict):
+    """Dictionary of the value arrays where the frequency of the scanned qubit is substituted"""
+
+    def __init__(self, values, masks, rows, w):
+        """Initailize the Class
+        Args:
+            values (ArrayValues): dictionary of the value arrays of all the targets
+            masks (dict): dictionary of the masks where the target is the scanned qubit
+            rows (np.ndarray): indices of the targets to be evaluated
+            w (np.ndarray): frequencies of the scanned qubit with the shape (len(rows), samples)
+        """
+        super().__init__()
+        self.values = values
+        self.masks = masks
+        self.rows = rows
+        self.w = w
+
+    def __missing__(self, name):
+        val = self.values[name][self.rows][:, None]
+        if name in self.masks:
+            val = np.where(self.masks[name][self.rows][:, None], self.w, val)
+        self[name] = val
+        return val
+
+def get_collision_windows(col, targets, scanned, lower, upper, step=50, tol=1e-3, context=None):
+    """find the frequency windows of the scanned qubits where the targets are in collision
+    The margin of each target is a rational function of the scanned frequency whose collision
+    windows are bounded by the zeros of the linear forms given by col.resonance. The margin is
+    sampled at these zeros and on a coarse grid, and the sign changes are refined by bisection.
+    Args:
+        col (FrequencyCollision): collision condition
+        targets (list or TargetIndex): list of the tuples of the target qubit labels
+        scanned (list): label of the scanned qubit for each target
+        lower (np.ndarray): lower bound of the scan for each target
+        upper (np.ndarray): upper bound of the scan for each target
+        step (float): spacing of the coarse grid in MHz
+        tol (float): tolerance of the window edges in MHz
+        context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+    Returns:
+        windows (list): list of the (start, stop) frequency windows in collision for each target
+    """
+    n = len(targets)
+    if n == 0:
+        return []
+    values = col.get_values(targets, context)
+    if type(targets) is TargetIndex:
+        targets = targets.targets
+    masks = {}
+    for name, pos in FREQUENCY_KEYS.items():
+        if pos < col.body:
+            masks[name] = np.array([t[pos] == q for t, q in zip(targets, scanned)])
+    rows = np.arange(n)
+
+    def margin(rows, w):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.broadcast_to(col.kernel(SubstitutedValues(values, masks, rows, w)), w.shape)
+
+    # the linear forms are evaluated at the frequency of 0 and 1 to find their zeros
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f0 = col.resonance(SubstitutedValues(values, masks, rows, np.zeros((n, 1))))
+        f1 = col.resonance(SubstitutedValues(values, masks, rows, np.ones((n, 1))))
+        roots = [np.broadcast_to(-a/(b-a), (n, 1)) for a, b in zip(f0, f1)]
+    roots = np.concatenate(roots, axis=1)
+    roots = np.concatenate([roots - tol, roots, roots + tol], axis=1)
+    grid = np.linspace(0, 1, max(int(np.ceil(np.max(upper - lower)/step)), 1) + 1)
+    grid = lower[:, None] + (upper - lower)[:, None]*grid[None, :]
+    roots = np.where(np.isfinite(roots), roots, lower[:, None])
+    samples = np.sort(np.clip(np.concatenate([grid, roots], axis=1), lower[:, None], upper[:, None]), axis=1)
+    collide = margin(rows, samples) < 0
+
+    # bisection of all the sign changes at once
+    r, c = np.nonzero(collide[:, 1:] != collide[:, :-1])
+    lo = samples[r, c]
+    hi = samples[r, c+1]
+    lo_state = collide[r, c]
+    for _ in range(int(np.ceil(np.log2(max(np.max(hi - lo, initial=0)/tol, 1))))):
+        mid = (lo + hi)/2
+        state = margin(r, mid[:, None])[:, 0] < 0
+        same = state == lo_state
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+    edge = (lo + hi)/2
+
+    windows = [[] for _ in range(n)]
+    start = np.where(collide[:, 0], samples[:, 0], np.nan)
+    for row, e, s in zip(r, edge, lo_state):
+        if s:
+            windows[row].append((float(start[row]), float(e)))
+        else:
+            start[row] = e
+    for row in np.nonzero(collide[:, -1])[0]:
+        windows[row].append((float(start[row]), float(samples[row, -1])))
+    return windows
+
+def get_linear_windows(col, targets, scanned, lower, upper, context=None):
+    """find the frequency windows of the scanned qubits where the targets are in collision, in closed form
+    The margin of a piecewise linear condition is linear on each side of the zeros of its
+    resonance forms, so that the zeros of the margin are solved from the margins at the zeros
+    and 1 MHz away from them. The sign between the zeros is given by the margin at the midpoints.
+    Args:
+        col (FrequencyCollision): collision condition with piecewise_linear
+        targets (list or TargetIndex): list of the tuples of the target qubit labels
+        scanned (list): label of the scanned qubit for each target
+        lower (np.ndarray): lower bound of the scan for each target
+        upper (np.ndarray): upper bound of the scan for each target
+        context (Context): lattice and calibration (the ones set by set_graph and set_info if None)
+    Returns:
+        windows (list): list of the (start, stop) frequency windows in collision for each target
+    """
+    n = len(targets)
+    if n == 0:
+        return []
+    values = col.get_values(targets, context)
+    if type(targets) is TargetIndex:
+        targets = targets.targets
+    masks = {}
+    for name, pos in FREQUENCY_KEYS.items():
+        if pos < col.body:
+            masks[name] = np.array([t[pos] == q for t, q in zip(targets, scanned)])
+    rows = np.arange(n)
+
+    def margin(w):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.broadcast_to(col.kernel(SubstitutedValues(values, masks, rows, w)), w.shape)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f0 = col.resonance(SubstitutedValues(values, masks, rows, np.zeros((n, 1))))
+        f1 = col.resonance(SubstitutedValues(values, masks, rows, np.ones((n, 1))))
+        roots = np.concatenate([np.broadcast_to(-a/(b-a), (n, 1)) for a, b in zip(f0, f1)], axis=1)
+        m = margin(roots)
+        left = roots - m/(m - margin(roots - 1))
+        right = roots - m/(margin(roots + 1) - m)
+    points = np.concatenate([lower[:, None], upper[:, None], roots, left, right], axis=1)
+    points = np.where(np.isfinite(points), points, lower[:, None])
+    points = np.sort(np.clip(points, lower[:, None], upper[:, None]), axis=1)
+    collide = margin((points[:, 1:] + points[:, :-1])/2) < 0
+
+    windows = [[] for _ in range(n)]
+    for row, col_row in zip(*np.nonzero(collide & (points[:, 1:] > points[:, :-1]))):
+        start, stop = float(points[row, col_row]), float(points[row, col_row + 1])
+        if windows[row] and windows[row][-1][1] == start:
+            windows[row][-1] = (windows[row][-1][0], stop)
+        else:
+            windows[row].append((start, stop))
+    return windows
+
+def subtract_windows(lower, upper, windows):
+    """subtract the windows from the range
+    Args:
+        lower (float): lower bound of the range
+        upper (float): upper bound of the range
+        windows (list): list of the (start, stop) windows to be subtracted
+    Returns:
+        allowed (list): list of the (start, stop) windows left in the range
+    """
+    allowed = []
+    cursor = lower
+    for start, stop in sorted(windows):
+        if start > cursor:
+            allowed.append((float(cursor), float(min(start, upper))))
+        cursor = max(cursor, stop)
+        if cursor >= upper:
+            break
+    if cursor < upper:
+        allowed.append((float(cursor), float(upper)))
+    return allowed
+
+def get_allowed_windows(condition, context, qubits=None, step=50, tol=1e-3):
+    """find the frequency windows of each qubit where it does not collide with its current neighbors
+    The other qubits are held fixed, and the windows are searched within
+    [min_frequency, max_frequency] of each qubit. Only the targets containing the scanned qubits
+    are evaluated, and they are listed from the index cached in the lattice of the context.
+    The windows of the piecewise linear conditions are solved in closed form, and the others
+    are searched on the grid and refined by bisection.
+    Args:
+        condition (list): list of the collision conditions
+        context (Context): lattice and calibration
+        qubits (list): list of the qubit labels to be scanned (all nodes if None)
+        step (float): spacing of the coarse grid in MHz
+        tol (float): tolerance of the window edges in MHz
+    Returns:
+        allowed (dict): dictionary of the list of the (start, stop) allowed frequency windows in MHz
+    """
+    if qubits is None:
+        qubits = list(context.lattice.nodes)
+    collision = {q: [] for q in qubits}
+    bounds = {}
+    for col in condition:
+        for q in qubits:
+            if q not in bounds:
+                bounds[q] = (col.get_value(q, "min_frequency", context), col.get_value(q, "max_frequency", context))
+        targets = []
+        scanned = []
+        for q in collision:
+            found = col.get_index(q, context).targets
+            targets += found
+            scanned += [q]*len(found)
+        lower = np.array([bounds[q][0] for q in scanned], dtype=float)
+        upper = np.array([bounds[q][1] for q in scanned], dtype=float)
+        if col.piecewise_linear:
+            windows = get_linear_windows(col, TargetIndex(targets), scanned, lower, upper, context)
+        else:
+            windows = get_collision_windows(col, TargetIndex(targets), scanned, lower, upper, step, tol, context)
+        for q, w in zip(scanned, windows):
+            collision[q] += w
+
+    allowed = {}
+    for q in qubits:
+        allowed[q] = subtract_windows(*bounds[q], collision[q]) if q in bounds else []
+    return allowed